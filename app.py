@@ -1,9 +1,6 @@
-import matplotlib
-matplotlib.use("TkAgg")
-
 import tkinter as tk
 from tkinter import ttk, messagebox
-from src import data_collection, donut_chart, sentiment_analysis, styles, validation
+from src import donut_chart, jobs, pipeline, sentiment_analysis, styles, validation
 from PIL import Image, ImageTk
 
 """
@@ -17,16 +14,46 @@ visualisation modules.
 
 Contains the key analyse methods that guide the application through the 
 other modules before updating the GUI.
+
+Analyses run as background jobs (see jobs.py) so the window stays
+responsive and the four analyses can run at the same time. While an
+analysis runs its button shows progress, clicking it again cancels it,
+and the donut is only updated once the analysis has finished. The
+fetch, score and aggregate steps themselves live in pipeline.py, shared
+with the headless cli.py.
+
+To start quickly the window is drawn before the donut charts are created,
+and nltk and matplotlib are only imported when first needed.
     
 """
  
 
+# When True each button press only collects and scores posts not seen on
+# previous presses, and the donuts show running totals across all of them
+INCREMENTAL_MODE = False
+
+# "csv", or "parquet" / "arrow" (needs pyarrow) for typed columnar data files
+DATA_FORMAT = "csv"
+
+# When True the Reddit analyses also collect the top comments of each post
+# and weight them (many more requests, so much slower). Can't be combined
+# with INCREMENTAL_MODE, whose running counts aren't weighted
+INCLUDE_COMMENTS = False
+
 root = tk.Tk()
 root.title("Manchester United Sentiment Analyzer")
 root.geometry("820x900")
 
 styles.apply_styles(root)
 
+job_runner = jobs.JobRunner(root)
+
+def on_close():
+    job_runner.shutdown()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 analysis_info = {
     "mu_reddit": None,
     "general_reddit": None,
@@ -66,17 +93,69 @@ def show_info(section):
         )
         return
 
+    # with comments collected the counts include them
+    counted = "titles and comments" if info["comments"] else "titles"
+
     lines = ["Sources used for this analysis:\n"]
 
     for source, count in info["sources"].items():
-        lines.append(f"{source}: {count} titles")
+        lines.append(f"{source}: {count} {counted}")
 
-    lines.append(f"\nTotal titles analysed: {info['total']}")
+    lines.append(f"\nTotal {counted} analysed: {info['total']}")
 
     text = "\n".join(lines)
 
     messagebox.showinfo("Source Information", text)
 
+def run_analysis(section, button, donut):
+    if job_runner.is_running(section):
+        job_runner.cancel(section)
+        button.config(text="Cancelling...")
+        return
+
+    label = button.cget("text")
+
+    def work(job):
+        return pipeline.run_pipeline(
+            section,
+            incremental_mode=INCREMENTAL_MODE,
+            cache=sentiment_analysis.default_cache_for_backend(),
+            cancel_event=job.cancel_event,
+            progress=job.progress,
+            output_format=DATA_FORMAT,
+            comments=INCLUDE_COMMENTS
+        )
+
+    def on_progress(message):
+        button.config(text=f"{message} (click to cancel)")
+
+    def on_done(summary):
+        button.config(text=label)
+
+        percentages = summary["percentages"]
+        donut.update(percentages["positive"], percentages["negative"], percentages["neutral"])
+
+        analysis_info[section] = {
+            "total": summary["total"],
+            "sources": summary["sources"],
+            "comments": INCLUDE_COMMENTS and pipeline.ANALYSES[section]["collector"] == "reddit"
+        }
+
+    def on_error(e):
+        button.config(text=label)
+        messagebox.showerror(
+            title="Error",
+            message=f"Something went wrong:\n\n{e}"
+        )
+
+    job_runner.submit(
+        section, work,
+        on_done=on_done,
+        on_error=on_error,
+        on_progress=on_progress,
+        on_cancel=lambda: button.config(text=label)
+    )
+
 about_btn = styles.create_info_dot(root, command=show_about)
 about_btn.grid(row=0, column=1, sticky="ne", padx=5, pady=5)
 
@@ -87,34 +166,13 @@ mu_frame = ttk.LabelFrame(root, padding=(10, 10))
 mu_frame.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
 
 def analyze_mu():
-    try:
-        total_count, source_count = data_collection.fetch_reddit_json("mu", True)
-        
-        df = sentiment_analysis.analyze_csv_sentiment("data/reddit/mu_posts.csv")
-
-        pos_percent = (df["sentiment"]=="Positive").mean() * 100
-        neg_percent = (df["sentiment"]=="Negative").mean() * 100
-        neu_percent = (df["sentiment"]=="Neutral").mean() * 100
-
-        mu_red_donut.update(pos_percent, neg_percent, neu_percent)
-        
-        analysis_info["mu_reddit"] = {
-            "total": total_count,
-            "sources": source_count
-        }
-        
-    except Exception as e:
-        messagebox.showerror(
-        title="Error",
-        message=f"Something went wrong:\n\n{e}"
-    )
+    run_analysis("mu_reddit", mu_button, mu_red_donut)
 
 mu_button = ttk.Button(mu_frame, text="Analyze MU Fan Subreddit Sentiment", style="Action.TButton", command=analyze_mu)
 mu_button.grid(row=0, column=0, pady=5, sticky="ew")
 
 mu_red_frame_chart = ttk.Frame(mu_frame)
 mu_red_frame_chart.grid(row=1, column=0, pady=10)
-mu_red_donut = donut_chart.DonutChart(mu_red_frame_chart)
 
 mu_info_btn = styles.create_info_dot(mu_frame, command=lambda: show_info("mu_reddit"))
 mu_info_btn.grid(row=1, column=0, sticky="ne", padx=1, pady=1)
@@ -123,106 +181,49 @@ gen_frame = ttk.LabelFrame(root, padding=(10,10))
 gen_frame.grid(row=1, column=1, padx=20, pady=10, sticky="nsew")
 
 def analyze_general():
-    try:
-        total_count, source_count = data_collection.fetch_reddit_json("gen", False)
-        
-        df = sentiment_analysis.analyze_csv_sentiment("data/reddit/general_posts.csv")
-
-        pos_percent = (df["sentiment"]=="Positive").mean() * 100
-        neg_percent = (df["sentiment"]=="Negative").mean() * 100
-        neu_percent = (df["sentiment"]=="Neutral").mean() * 100
-
-        gen_red_donut.update(pos_percent, neg_percent, neu_percent)
-        
-        analysis_info["general_reddit"] = {
-            "total": total_count,
-            "sources": source_count
-        }
-        
-    except Exception as e:
-        messagebox.showerror(
-        title="Error",
-        message=f"Something went wrong:\n\n{e}"
-    )
+    run_analysis("general_reddit", gen_button, gen_red_donut)
 
 gen_button = ttk.Button(gen_frame, text="Analyze General Football Subreddit Sentiment", style="Action.TButton", command=analyze_general)
 gen_button.grid(row=0, column=0, pady=5, sticky="ew")
 
 gen_red_frame_chart = ttk.Frame(gen_frame)
 gen_red_frame_chart.grid(row=1, column=0, pady=10)
-gen_red_donut = donut_chart.DonutChart(gen_red_frame_chart)
 
 gen_info_btn = styles.create_info_dot(gen_frame,  command=lambda: show_info("general_reddit"))
 gen_info_btn.grid(row=1, column=0, sticky="ne", padx=1, pady=1)
 
 def analyze_mu_news():
-    try:
-
-        total_count, source_count = data_collection.fetch_news_rss("mu", mu_only=True)
-
-        df = sentiment_analysis.analyze_csv_sentiment("data/news/mu_articles.csv")
-
-        pos_percent = (df["sentiment"]=="Positive").mean() * 100
-        neg_percent = (df["sentiment"]=="Negative").mean() * 100
-        neu_percent = (df["sentiment"]=="Neutral").mean() * 100
-
-        mu_news_donut.update(pos_percent, neg_percent, neu_percent)
-        
-        analysis_info["mu_news"] = {
-            "total": total_count,
-            "sources": source_count
-        }
-
-    except Exception as e:
-        messagebox.showerror(
-        title="Error",
-        message=f"Something went wrong:\n\n{e}"
-    )
+    run_analysis("mu_news", mu_news_button, mu_news_donut)
        
 mu_news_button = ttk.Button(mu_frame, text="Analyze MU Dedicated News Sentiment", style="Action.TButton", command=analyze_mu_news)
 mu_news_button.grid(row=2, column=0, pady=5, sticky="ew")
 
 mu_news_frame_chart = ttk.Frame(mu_frame)
 mu_news_frame_chart.grid(row=3, column=0, pady=10)
-mu_news_donut = donut_chart.DonutChart(mu_news_frame_chart)
 
 mu_news_info_btn = styles.create_info_dot(mu_frame, command=lambda: show_info("mu_news"))
 mu_news_info_btn.grid(row=3, column=0, sticky="ne", padx=1, pady=1)
 
 def analyze_general_news_button():
-    try:
-        
-        total_count, source_count = data_collection.fetch_news_rss("gen", mu_only=False)
-
-        df = sentiment_analysis.analyze_csv_sentiment("data/news/general_articles.csv")
-
-        pos_percent = (df["sentiment"]=="Positive").mean() * 100
-        neg_percent = (df["sentiment"]=="Negative").mean() * 100
-        neu_percent = (df["sentiment"]=="Neutral").mean() * 100
-
-        general_news_donut.update(pos_percent, neg_percent, neu_percent)
-        
-        analysis_info["general_news"] = {
-            "total": total_count,
-            "sources": source_count
-        }
-
-    except Exception as e:
-        messagebox.showerror(
-        title="Error",
-        message=f"Something went wrong:\n\n{e}"
-    )
+    run_analysis("general_news", general_news_button, general_news_donut)
         
 general_news_button = ttk.Button(gen_frame, text="Analyze General News Sentiment", style="Action.TButton", command=analyze_general_news_button)
 general_news_button.grid(row=2, column=0, pady=5, sticky="ew")
 
 general_news_frame_chart = ttk.Frame(gen_frame)
 general_news_frame_chart.grid(row=3, column=0, pady=10)
-general_news_donut = donut_chart.DonutChart(general_news_frame_chart)
 
 gen_news_info_btn = styles.create_info_dot(gen_frame, command=lambda: show_info("general_news"))
 gen_news_info_btn.grid(row=3, column=0, sticky="ne", padx=1, pady=1)
 
+# show the window before building the charts, matplotlib is the slowest part of startup
+root.update()
+
+mu_red_donut = donut_chart.DonutChart(mu_red_frame_chart)
+gen_red_donut = donut_chart.DonutChart(gen_red_frame_chart)
+mu_news_donut = donut_chart.DonutChart(mu_news_frame_chart)
+general_news_donut = donut_chart.DonutChart(general_news_frame_chart)
+
 root.update_idletasks()
 
 width = root.winfo_width()
@@ -0,0 +1,276 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+"""
+Command Line Entrypoint
+
+Runs the collection and scoring pipeline without the GUI, for scheduled
+runs on machines without a display. Nothing here imports tkinter or
+matplotlib
+
+Usage, from the project folder:
+
+    python -m src.cli mu_reddit general_news --format csv --output summary.csv
+    python -m src.cli all --incremental
+    python -m src.cli all --record fixtures/run1
+    python -m src.cli all --replay fixtures/run1
+
+Prints (or writes) one summary per analysis with the label percentages,
+the per-source counts and the time taken by each stage
+
+    python -m src.cli --startup-benchmark
+
+imports the GUI's modules in fresh interpreters under -X importtime and
+prints the median wall clock and import times, the slowest top level
+imports and whether any of DEFERRED_MODULES (only needed once an analysis
+runs or a chart is drawn) were imported at startup, which exits 1
+
+Exit codes:
+
+0 - every analysis ran and collected at least one title, or with
+    --incremental found nothing new (status "no_new_data")
+1 - at least one analysis failed, the error is written to stderr
+2 - bad arguments
+3 - every analysis ran but at least one of them collected nothing
+
+"""
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_DATA = 3
+
+# what app.py imports before its window appears
+STARTUP_MODULES = ["src.donut_chart", "src.jobs", "src.pipeline", "src.sentiment_analysis", "src.styles", "src.validation"]
+DEFERRED_MODULES = ["nltk", "matplotlib", "sklearn", "scipy"]
+STARTUP_RUNS = 5
+
+def build_parser():
+    from src.pipeline import ANALYSES
+    from src.sentiment_analysis import SCORING_BACKENDS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Collect and score Manchester United sentiment without the GUI"
+    )
+    # checked in main, argparse rejects an empty list when nargs="*" has choices
+    parser.add_argument(
+        "analyses", nargs="*", metavar="ANALYSIS",
+        help=f"analyses to run ({', '.join(ANALYSES)}), or 'all'"
+    )
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="summary format (default json)")
+    parser.add_argument("--output", help="write the summary to this file instead of stdout")
+    parser.add_argument("--incremental", action="store_true", help="only collect and score posts not seen on earlier runs")
+    parser.add_argument("--workers", type=int, default=1, help="processes used for scoring (default 1)")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", action="store_true",
+                       help="use the persistent score cache (the default with --scorer vader)")
+    cache.add_argument("--no-cache", action="store_true", help="don't use the persistent score cache")
+    parser.add_argument("--scorer", choices=SCORING_BACKENDS, default=SCORING_BACKENDS[0],
+                        help="vectorized batch scoring (default) or VADER's polarity_scores per text, the scores are the same")
+    parser.add_argument("--data-format", choices=["csv", "parquet", "arrow"],
+                        help="file format for the collected data (default csv, the others need pyarrow)")
+    parser.add_argument("--comments", action="store_true",
+                        help="also collect the top comments of each Reddit post and weight the results")
+    parser.add_argument("--streaming", action="store_true",
+                        help="score posts while they are still being collected instead of after, Reddit analyses only (see streaming.py)")
+    parser.add_argument("--sink", metavar="FILE",
+                        help="with --streaming, also write the scored rows to FILE (.csv, .parquet or .arrow)")
+    http = parser.add_mutually_exclusive_group()
+    http.add_argument("--no-http-cache", action="store_true", help="always download, even if fetched in the last minute")
+    http.add_argument("--record", metavar="DIR", help="save every HTTP response as a fixture in DIR")
+    http.add_argument("--replay", metavar="DIR", help="serve HTTP responses from fixtures in DIR, without the network")
+    parser.add_argument("--store", nargs="?", const="data/sentiment.sqlite3", help="also record results in an SQLite store")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="time importing the GUI's modules instead of running analyses")
+    return parser
+
+def startup_benchmark(modules=STARTUP_MODULES, runs=STARTUP_RUNS):
+
+    # each run imports modules in a new interpreter, so nothing is already
+    # imported. -X importtime reports the cumulative time of every import,
+    # the total adds up the top level ones (the lines whose name has no
+    # extra indentation) and slowest lists any of them, nested or not
+
+    import statistics
+    import subprocess
+
+    command = [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)]
+    wall, imports, slowest, loaded = [], [], {}, set()
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        wall.append(time.perf_counter() - start)
+
+        total = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+
+            _, cumulative, name = line.split("|")
+            seconds = int(cumulative) / 1e6
+
+            if not name.startswith("   "):
+                total += seconds
+
+            name = name.strip()
+            slowest[name] = slowest.get(name, 0) + seconds / runs
+            loaded.add(name.split(".")[0])
+
+        imports.append(total)
+
+    return {
+        "modules": modules,
+        "runs": runs,
+        "wall_seconds": round(statistics.median(wall), 3),
+        "import_seconds": round(statistics.median(imports), 3),
+        "slowest": {name: round(seconds, 3) for name, seconds in sorted(slowest.items(), key=lambda item: -item[1])[:10]},
+        "deferred_imported": sorted(loaded & set(DEFERRED_MODULES)),
+    }
+
+def sink_path(sink, name):
+
+    # one file per analysis next to the given one, out/x.csv -> out/mu_reddit_x.csv
+
+    sink = Path(sink)
+    return sink.with_name(f"{name}_{sink.name}")
+
+def format_summaries(summaries, output_format):
+    if output_format == "json":
+        return json.dumps(summaries, indent=2)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["analysis", "status", "total", "positive", "negative", "neutral",
+                     "weighted_compound", "fetch_seconds", "score_seconds", "aggregate_seconds", "total_seconds", "error"])
+
+    for summary in summaries:
+        percentages = summary.get("percentages", {})
+        timings = summary.get("timings", {})
+        writer.writerow([
+            summary["analysis"], summary["status"], summary.get("total", ""),
+            percentages.get("positive", ""), percentages.get("negative", ""), percentages.get("neutral", ""),
+            summary.get("weighted_compound", ""), timings.get("fetch", ""), timings.get("score", ""), timings.get("aggregate", ""),
+            timings.get("total", ""), summary.get("error", ""),
+        ])
+
+    return buffer.getvalue()
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.startup_benchmark:
+        result = startup_benchmark()
+        print(json.dumps(result, indent=2))
+        return EXIT_FAILED if result["deferred_imported"] else EXIT_OK
+
+    from src import http_client, pipeline, sentiment_analysis
+
+    if not args.analyses:
+        parser.error("name at least one analysis, or 'all'")
+
+    for name in args.analyses:
+        if name not in pipeline.ANALYSES and name != "all":
+            parser.error(f"invalid analysis '{name}' (choose from {', '.join(pipeline.ANALYSES)}, all)")
+
+    names = list(pipeline.ANALYSES) if "all" in args.analyses else list(dict.fromkeys(args.analyses))
+
+    reddit = [name for name in names if pipeline.ANALYSES[name]["collector"] == "reddit"]
+    if args.incremental and args.comments and reddit:
+        parser.error("--comments can't be combined with --incremental, incremental counts aren't weighted")
+
+    if args.streaming:
+        news = [name for name in names if pipeline.ANALYSES[name]["collector"] == "news"]
+        if news:
+            parser.error(f"--streaming can't collapse duplicate news stories, run {', '.join(news)} without it")
+
+        # the streaming pipeline doesn't support these, see streaming.py
+        for option, given in (("--incremental", args.incremental), ("--data-format", args.data_format), ("--comments", args.comments)):
+            if given:
+                parser.error(f"{option} can't be combined with --streaming")
+    elif args.sink:
+        parser.error("--sink needs --streaming")
+
+    if args.replay:
+        http_client.set_default_client(http_client.ReplayClient(args.replay))
+    elif args.record:
+        http_client.set_default_client(http_client.RecordingClient(args.record))
+    elif args.no_http_cache:
+        http_client.set_default_client(http_client.HttpClient())
+
+    sentiment_analysis.SCORING_BACKEND = args.scorer
+
+    if args.cache:
+        cache = sentiment_analysis.default_cache()
+    elif args.no_cache:
+        cache = None
+    else:
+        cache = sentiment_analysis.default_cache_for_backend()
+
+    store = None
+    if args.store:
+        from src.storage import SentimentStore
+        store = SentimentStore(args.store)
+
+    summaries = []
+    exit_code = EXIT_OK
+
+    for name in names:
+        start = time.perf_counter()
+
+        try:
+            # the collectors log progress with print, keep stdout for the summary
+            with contextlib.redirect_stdout(sys.stderr):
+                if args.streaming:
+                    from src import streaming
+                    sink = args.sink and (args.sink if len(names) == 1 else sink_path(args.sink, name))
+                    summary = streaming.run_streaming(name, args.workers, cache, store, output_path=sink)
+                else:
+                    summary = pipeline.run_pipeline(
+                        name,
+                        incremental_mode=args.incremental,
+                        workers=args.workers,
+                        cache=cache,
+                        store=store,
+                        output_format=args.data_format or "csv",
+                        comments=args.comments
+                    )
+            # a quiet incremental run (nothing posted since the last one) isn't a failure
+            if summary["total"]:
+                summary["status"] = "ok"
+            elif args.incremental:
+                summary["status"] = "no_new_data"
+            else:
+                summary["status"] = "no_data"
+        except Exception as e:
+            summary = {"analysis": name, "status": "failed", "error": f"{type(e).__name__}: {e}", "timings": {}}
+            print(f"{name} failed: {summary['error']}", file=sys.stderr)
+
+        summary["timings"]["total"] = round(time.perf_counter() - start, 3)
+        summaries.append(summary)
+
+        if summary["status"] == "failed":
+            exit_code = EXIT_FAILED
+        elif summary["status"] == "no_data" and exit_code == EXIT_OK:
+            exit_code = EXIT_NO_DATA
+
+    text = format_summaries(summaries, args.format)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
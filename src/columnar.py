@@ -0,0 +1,140 @@
+from pathlib import Path
+import pandas as pd
+
+"""
+Columnar Storage Module
+
+Optional Parquet / Arrow IPC output for the collected and scored datasets,
+as an alternative to the default CSV files
+
+CSV keeps everything as text, so every read re-parses the titles and
+re-infers the column types. The columnar formats store the types with the
+data and let a reader load only the columns it needs:
+
+- source and sentiment are stored as categoricals (a handful of distinct
+  values repeated on every row)
+- date is stored as a date rather than a string
+- the VADER score columns are stored as float32, which keeps the 3 or 4
+  decimal places VADER rounds to
+
+The format is chosen by file suffix (.csv, .parquet or .arrow), data_path
+maps the CSV paths used elsewhere onto the matching file for a format.
+Columnar files can't be appended to, so append_table reads the existing
+file and rewrites it, which is fine at the size of a collected dataset
+
+TableWriter is the sink used by the streaming pipeline, CSV rows are
+appended as each batch arrives, the columnar formats keep the batches and
+write the file once when the writer is closed
+
+pyarrow is only needed for the columnar formats and is imported when one
+is first used, CSV works without it
+
+"""
+
+FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+CATEGORY_COLUMNS = ["source", "sentiment"]
+FLOAT32_COLUMNS = ["compound", "neg", "neu", "pos"]
+
+def data_path(csv_path, output_format="csv"):
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{output_format}', expected one of {', '.join(FORMATS)}")
+    return str(Path(csv_path).with_suffix(FORMATS[output_format]))
+
+def file_format(path):
+    suffix = Path(path).suffix.lower()
+    for output_format, format_suffix in FORMATS.items():
+        if suffix == format_suffix:
+            return output_format
+    raise ValueError(f"Unsupported file type '{suffix}' for {path}")
+
+def compact_types(df):
+
+    # returns a copy with the column types the columnar formats store,
+    # columns that aren't present are skipped
+
+    df = df.copy()
+
+    if "date" in df:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+
+    for column in FLOAT32_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("float32")
+
+    return df
+
+def write_table(df, path):
+    output_format = file_format(path)
+
+    if output_format == "csv":
+        df.to_csv(path, index=False, encoding="utf-8")
+        return
+
+    _require_pyarrow()
+    df = compact_types(df)
+
+    if output_format == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+
+def append_table(df, path):
+    if Path(path).exists():
+        # categoricals with different categories would concat as object
+        existing = read_table(path)
+        for column in CATEGORY_COLUMNS:
+            if column in existing:
+                existing[column] = existing[column].astype(object)
+        df = pd.concat([existing, df], ignore_index=True)
+
+    write_table(df, path)
+
+def read_table(path, columns=None):
+
+    # columns limits the read to just those columns, for the columnar
+    # formats the others are never loaded from disk
+
+    output_format = file_format(path)
+
+    if output_format == "csv":
+        return pd.read_csv(path, usecols=columns)
+
+    _require_pyarrow()
+
+    if output_format == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+class TableWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self.rows = 0
+        self._frames = []
+
+    def write(self, df):
+        if self.format == "csv":
+            df.to_csv(self.path, mode="a" if self.rows else "w", header=not self.rows, index=False, encoding="utf-8")
+        else:
+            self._frames.append(df)
+        self.rows += len(df)
+
+    def close(self):
+        if self._frames:
+            write_table(pd.concat(self._frames, ignore_index=True), self.path)
+            self._frames = []
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need pyarrow, install it with 'pip install pyarrow'") from None
@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import requests
+from src import http_client
+from src.preprocessing import clean_text
+
+"""
+Reddit Comments Module
+
+Optional collection of the top comments under each Reddit post, so the
+sentiment of the discussion and not just the headline can be measured
+
+Comment volume is many times the title volume, so comments are fetched
+through a CommentFetcher:
+
+- submit(post_id) returns a Future straight away, so the subreddit paging
+  carries on while comments download in the background
+- at most max_workers comment requests run at once, on top of the per host
+  rate limit in http_client.py
+- asking for a post that is already being fetched returns the same Future
+  rather than a second request (e.g. a post that is hot in two subreddits)
+- responses are kept per post in a small JSON cache for CACHE_TTL seconds,
+  so re-running an analysis doesn't download every thread again
+
+parse_comments only turns a comments.json payload into rows, so it can be
+run against recorded responses without any network access
+
+A failed request gives no comments for that post rather than failing the
+collection, the same as a failed news feed
+
+"""
+
+COMMENT_URL_TEMPLATE = "https://www.reddit.com/comments/{}.json"
+COMMENT_CACHE_FILE = "data/cache/comments.json"
+
+MAX_COMMENT_WORKERS = 4
+MAX_COMMENTS = 5
+COMMENT_DEPTH = 2
+COMMENT_TIMEOUT = 5
+CACHE_TTL = 3600
+
+def parse_comments(payload, max_comments=MAX_COMMENTS):
+
+    # payload is the decoded comments.json response, [post listing, comment
+    # listing]. Replies are walked depth first under their parent comment
+
+    if not isinstance(payload, list) or len(payload) < 2:
+        return []
+
+    comments = []
+    pending = list(payload[1]["data"]["children"])
+
+    while pending and len(comments) < max_comments:
+        c = pending.pop(0)
+
+        if c.get("kind") != "t1":
+            continue
+
+        d = c["data"]
+
+        replies = d.get("replies")
+        if isinstance(replies, dict):
+            pending[0:0] = replies["data"]["children"]
+
+        cleaned = clean_text(d.get("body", "").strip())
+        if not cleaned:
+            continue
+
+        comments.append({
+            "date": datetime.fromtimestamp(d.get("created_utc", 0)).strftime("%Y-%m-%d"),
+            "text": cleaned,
+            "level": "comment",
+            "depth": d.get("depth", 0),
+            "score": d.get("score", 0),
+        })
+
+    return comments
+
+class CommentFetcher:
+    def __init__(self, client=None, max_workers=MAX_COMMENT_WORKERS, max_comments=MAX_COMMENTS,
+                 cache_path=COMMENT_CACHE_FILE, ttl=CACHE_TTL, url_template=COMMENT_URL_TEMPLATE):
+        self.client = client or http_client.default_client()
+        self.max_comments = max_comments
+        self.ttl = ttl
+        self.url_template = url_template
+        self.cache_path = Path(cache_path) if cache_path else None
+
+        self.stats = {"requests": 0, "cached": 0, "coalesced": 0, "failed": 0}
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    def submit(self, post_id):
+        with self._lock:
+            entry = self._cache.get(post_id)
+            if entry and time.time() - entry["fetched"] < self.ttl:
+                self.stats["cached"] += 1
+                future = Future()
+                future.set_result(entry["comments"])
+                return future
+
+            if post_id in self._inflight:
+                self.stats["coalesced"] += 1
+                return self._inflight[post_id]
+
+            future = self._pool.submit(self._fetch, post_id)
+            self._inflight[post_id] = future
+            return future
+
+    def fetch_many(self, post_ids):
+        futures = {post_id: self.submit(post_id) for post_id in post_ids}
+        return {post_id: future.result() for post_id, future in futures.items()}
+
+    def _fetch(self, post_id):
+        try:
+            r = self.client.get(
+                self.url_template.format(post_id),
+                params={"limit": self.max_comments, "depth": COMMENT_DEPTH, "sort": "top"},
+                timeout=COMMENT_TIMEOUT
+            )
+            r.raise_for_status()
+            comments = parse_comments(r.json(), self.max_comments)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"Comments for {post_id} failed: {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+                self._inflight.pop(post_id, None)
+            return []
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self._cache[post_id] = {"fetched": time.time(), "comments": comments}
+            self._inflight.pop(post_id, None)
+
+        return comments
+
+    def _load_cache(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+
+        try:
+            cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except ValueError:
+            return {}
+
+        # expired entries are dropped so the file doesn't grow forever
+        now = time.time()
+        return {post_id: entry for post_id, entry in cache.items() if now - entry["fetched"] < self.ttl}
+
+    def save(self):
+        if self.cache_path is None:
+            return
+
+        with self._lock:
+            data = json.dumps(self._cache)
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_path.write_text(data, encoding="utf-8")
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.save()
@@ -1,9 +1,18 @@
-from tkinter import messagebox
 import requests
 import feedparser
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
+from src import columnar, dedup, http_client
+from src.comments import CommentFetcher
+from src.keyword_index import KeywordIndex
+from src.incremental import SeenIndex, reset as reset_incremental
 from src.preprocessing import clean_text
 
 """
@@ -19,31 +28,79 @@ Data is collected from (for now):
 
 General Reddit and RSS News feeds are filtered using Man united keywords
 constant variable - Future implementation could look to access these words
-programmatically, especially as keywords change over time
+programmatically, especially as keywords change over time. The keywords are
+compiled once into a KeywordIndex (keyword_index.py) which matches whole
+words only, so the list can grow to thousands of aliases without slowing
+the filter down
 
 Once data is collected it is prepared using utility from preprocessing.py
 
+Collection is split into stages that streaming.py also uses on their own:
+iter_subreddit_posts lazily pages through a subreddit, and reddit_rows /
+news_rows clean and keyword filter posts and feed entries into rows
+
 Standardised with date, text, and source metadata
 
+Subreddits are fetched concurrently over a shared keep-alive session from
+http_client.py, which also rate limits requests per host. Pages within a
+single subreddit are still fetched one after the other as each page needs
+the 'after' token of the previous one. Per-subreddit timings are printed
+and can be collected by passing a stats dict
+
+RSS feeds are downloaded in parallel with a timeout per feed, so a slow
+publisher only loses its own articles. Each feed's ETag/Last-Modified
+headers and extracted entries are kept in feed_cache.json and sent back on
+the next run, unchanged feeds answer 304 and their saved entries are reused
+without re-downloading or re-parsing. Status, latency and bytes transferred
+per feed can be collected through the stats dict. Analyses can run at
+the same time, so a run only saves the feeds it fetched, merged into the
+file under a lock and written through a temporary file
+
 The collected data is saved as CSV files in data folder for downstream
-sentiment analysis and visualisation
+sentiment analysis and visualisation. With incremental=True only posts and
+articles not collected before are appended to the existing CSV, using the
+seen index from incremental.py. Reddit paging also stops early once a page
+holds nothing new
+
+Both fetchers take an optional cancel_event (threading.Event), checked
+between pages and before each feed, so a run started from the GUI can be
+cancelled. A cancelled run returns without writing anything
+
+output_format="parquet" or "arrow" saves the collected data in that
+format (see columnar.py) instead of CSV, next to where the CSV would be
+
+Passing a SentimentStore (storage.py) also records the collected rows in
+SQLite, keeping a history that the overwritten CSVs don't
+
+News articles that are the same story (e.g. one agency story in several
+feeds) are collapsed into one row with dedup.py before saving, the row
+keeps the first copy and a sources column lists every feed that carried
+it, so the story is scored and counted once. The per-source counts still
+count the story for every one of those feeds
 
 The module also tracks per-source counts to support reporting
 and transparency in the GUI and has a normalisation method for cleaning 
 up sources when presented to user
 
 Note: Subreddit limits placed at 100 and can easily be changed. also, reddit
-thread comments allow a much deeper dive into sentiment. However both the limit
-and comment functionality would require API calls that surpass what is allowed 
-without a Reddit developer account and therefore wasnt continued with for now.
-
-It is for that reason there are commented out fetch comments functionality in
-this file  
+thread comments allow a much deeper dive into sentiment. With comments=True
+the top comments of each collected post are fetched as well (see
+comments.py) and saved after their post with level, depth, score and
+thread_id columns, which sentiment analysis uses to weight them. This
+multiplies the number of API calls so it is off by default
 """
 
 MU_SUBREDDITS = ["ManchesterUnited", "RedDevils"]
 GENERAL_SUBREDDITS = ["soccer", "PremierLeague", "football"]
 
+REDDIT_URL_TEMPLATE = "https://www.reddit.com/r/{}/hot.json"
+
+MAX_FETCH_WORKERS = 5
+
+MAX_FEED_WORKERS = 8
+FEED_TIMEOUT = 10
+FEED_CACHE_FILE = "data/news/feed_cache.json"
+
 MU_NEWS_FEEDS = [
     "https://www.manutd.com/Feeds/NewsSecondRSSFeed",
     "https://thepeoplesperson.com/feed/",
@@ -90,212 +147,222 @@ MANCHESTER_UNITED_KEYWORDS = [
     "paul scholes", "roy keane", "gary neville", "andy mitten", "ugarte", "kobbie mainoo"
 ]
 
-def fetch_reddit_json(type, mu_only, limit=100):
-    subreddits = []
+KEYWORD_INDEX = KeywordIndex(MANCHESTER_UNITED_KEYWORDS)
+
+_feed_cache_lock = threading.Lock()
+
+def subreddits_for(type):
+    if type == "mu":
+        return MU_SUBREDDITS
+    elif type == "gen":
+        return GENERAL_SUBREDDITS
+    raise ValueError(f"Unknown type '{type}', expected 'mu' or 'gen'")
+
+def feeds_for(type):
     if type == "mu":
-        subreddits = MU_SUBREDDITS
+        return MU_NEWS_FEEDS
     elif type == "gen":
-        subreddits = GENERAL_SUBREDDITS
-    else:
-        messagebox.showerror("error")
+        return GENERAL_NEWS_FEEDS
+    raise ValueError(f"Unknown type '{type}', expected 'mu' or 'gen'")
+
+def fetch_reddit_json(type, mu_only, limit=100, client=None, stats=None, url_template=REDDIT_URL_TEMPLATE, incremental=False, store=None, cancel_event=None, output_format="csv", comments=False):
+    subreddits = subreddits_for(type)
     
-    url_template = "https://www.reddit.com/r/{}/hot.json"
-    headers = {"User-Agent": "windows:manchester-united-sentiment-uni-project:v1.0"}
+    client = client or http_client.default_client()
 
     Path("data/reddit").mkdir(parents=True, exist_ok=True)
     all_posts = []
     
     source_counts = {}
+    
+    output_file = columnar.data_path(
+        "data/reddit/mu_posts.csv"
+        if mu_only
+        else "data/reddit/general_posts.csv",
+        output_format
+    )
+    
+    seen = SeenIndex(output_file) if incremental else None
+    
+    comment_fetcher = CommentFetcher(client) if comments else None
+    
+    def fetch(subreddit):
+        return fetch_subreddit(client, url_template, subreddit, mu_only, limit, seen, cancel_event, comment_fetcher)
 
-    for subreddit in subreddits:
-        subreddit_posts = []
-        title_count = 0
-        after = None
-        
-        max_pages = 20
-        pages = 0
-        
-        while title_count < limit and pages < max_pages:
-            params = {
-                "limit": 100,
-                "after": after
-            }
-            
-            url = url_template.format(subreddit)
-            r = requests.get(url, headers=headers, params=params, timeout=10)
-            r.raise_for_status()
-
-            data = r.json()["data"]
-            posts = data["children"]
-            after = data["after"]
-        
-            print(subreddit, len(posts))
-            
-            if not posts:
-                break 
-
-            for post in posts:
-                p = post["data"]
-                raw_title = p.get("title", "").strip()
-                if not raw_title:
-                    continue
-
-                text_lower = raw_title.lower()
-
-                if mu_only:
-                    include = True
-                else:
-                    include = any(keyword in text_lower for keyword in MANCHESTER_UNITED_KEYWORDS)
-
-                if not include:
-                    continue
-
-                cleaned = clean_text(raw_title)
-                if not cleaned:
-                    continue
-
-                subreddit_posts.append({
-                    "date": datetime.fromtimestamp(p["created_utc"]).strftime("%Y-%m-%d"),
-                    "text": cleaned,
-                    "source": f"r/{subreddit}",
-                })
-                
-                title_count += 1
-                
-                # comments = fetch_comments(post_id)
-
-                # for c in comments:
-                    # subreddit_posts.append({
-                        # "date": datetime.utcfromtimestamp(p["created_utc"]).strftime("%Y-%m-%d"),
-                        # "text": c["text"],
-                        # "source": f"r/{subreddit}",
-                        # "level": "comment",
-                        # "depth": c["depth"],
-                        # "score": c["score"],
-                        # "thread_id": post_id
-                    # })
-                
-                if title_count >= limit:
-                    break
-                
-            pages += 1
-            
-            if after is None:
-                break  # reached end of subreddit history
+    # subreddits are fetched side by side, pages within a subreddit stay in order
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_FETCH_WORKERS, len(subreddits)))) as pool:
+        results = list(pool.map(fetch, subreddits))
+    
+    if comment_fetcher is not None:
+        comment_fetcher.close()
+        print(f"Comments: {comment_fetcher.stats}")
 
+    for subreddit, (subreddit_posts, timing) in zip(subreddits, results):
         all_posts.extend(subreddit_posts)
         
         source_counts[f"r/{subreddit}"] = len(subreddit_posts)
+        
+        if stats is not None:
+            stats[f"r/{subreddit}"] = timing
+    
+    if cancel_event is not None and cancel_event.is_set():
+        return 0, source_counts
 
     df = pd.DataFrame(all_posts)
 
-    output_file = (
-        "data/reddit/mu_posts.csv"
-        if mu_only
-        else "data/reddit/general_posts.csv"
-    )
-
-    df.to_csv(output_file, index=False, encoding="utf-8")
+    save_collected(df, output_file, seen, store)
 
     return len(df), source_counts
 
+def fetch_subreddit(client, url_template, subreddit, mu_only, limit, seen=None, cancel_event=None, comment_fetcher=None):
+    subreddit_posts = []
+    pending_comments = []
+    paging = {"pages": 0}
+    
+    start = time.perf_counter()
+    
+    posts = iter_subreddit_posts(client, url_template, subreddit, seen, cancel_event, paging)
+    
+    # islice stops pulling once limit titles are kept, so no further pages are requested
+    for p, row in islice(reddit_rows(posts, subreddit, mu_only), limit):
+        subreddit_posts.append(row)
+        
+        if comment_fetcher is not None:
+            # comments download in the background while paging carries on
+            row.update({"level": "title", "depth": 0, "score": p.get("score", 0), "thread_id": p["id"]})
+            pending_comments.append((row, comment_fetcher.submit(p["id"])))
+    
+    pages = paging["pages"]
+    
+    if pending_comments:
+        subreddit_posts = with_comments(subreddit_posts, pending_comments, subreddit, cancel_event)
+    
+    timing = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "pages": pages,
+    }
+    
+    print(f"r/{subreddit}: {len(subreddit_posts)} titles, {pages} pages in {timing['seconds']}s")
 
+    return subreddit_posts, timing
 
-"""
-def fetch_comments(post_id, max_comments=5):
-    
-    url = f"https://www.reddit.com/comments/{post_id}.json?limit={max_comments}"
-    headers = {"User-Agent": "windows:manchester-united-sentiment-uni-project:v1.0"}
 
-    try:
-        r = requests.get(url, headers=headers, timeout=5)
-        r.raise_for_status()
+def iter_subreddit_posts(client, url_template, subreddit, seen=None, cancel_event=None, paging=None, max_pages=20):
+    
+    # yields the raw data of each post not seen before, a page is only
+    # requested once the consumer has taken every post of the previous one
+    
+    after = None
+    pages = 0
+    
+    while pages < max_pages:
+        if cancel_event is not None and cancel_event.is_set():
+            return
         
-    except requests.RequestException:
-        return []
+        params = {
+            "limit": 100,
+            "after": after
+        }
+        
+        url = url_template.format(subreddit)
+        r = client.get(url, params=params, timeout=10)
+        r.raise_for_status()
 
-    data = r.json()
+        data = r.json()["data"]
+        posts = data["children"]
+        after = data["after"]
     
-    if not isinstance(data, list) or len(data) < 2:
-        return []
+        print(subreddit, len(posts))
+        
+        if not posts:
+            return
+        
+        pages += 1
+        if paging is not None:
+            paging["pages"] = pages
+        
+        new_posts = 0
 
-    comments_data = data[1]["data"]["children"]
+        for post in posts:
+            p = post["data"]
+            
+            if seen is not None and not seen.add(p.get("name") or p.get("id")):
+                continue
+            
+            new_posts += 1
+            yield p
+        
+        if after is None:
+            return  # reached end of subreddit history
+        
+        if seen is not None and not new_posts:
+            return  # everything further down has already been collected
 
-    comments = []
+def reddit_rows(posts, subreddit, mu_only):
+    
+    # the cleaning and keyword filter stage, yields (post data, row) for each
+    # post kept
+    
+    for p in posts:
+        raw_title = p.get("title", "").strip()
+        if not raw_title:
+            continue
 
-    for c in comments_data:
+        text_lower = raw_title.lower()
 
-        if c.get("kind") != "t1":
-            continue
+        if mu_only:
+            include = True
+        else:
+            include = KEYWORD_INDEX.contains(text_lower)
 
-        d = c["data"]
-        body = d.get("body", "").strip()
-        if not body:
+        if not include:
             continue
 
-        cleaned = clean_text(body)
+        cleaned = clean_text(raw_title)
         if not cleaned:
             continue
 
-        comments.append({
+        yield p, {
+            "date": datetime.fromtimestamp(p["created_utc"]).strftime("%Y-%m-%d"),
             "text": cleaned,
-            "level": "comment",
-            "depth": d.get("depth", 1),
-            "score": d.get("score", 0)
-        })
+            "source": f"r/{subreddit}",
+        }
 
-        if len(comments) >= max_comments:
-            break
-
-    return comments
-"""
+def with_comments(posts, pending_comments, subreddit, cancel_event=None):
+    
+    # each post is followed by its comments, in the order the posts were found
+    
+    comment_rows = {}
+    for row, future in pending_comments:
+        if cancel_event is not None and cancel_event.is_set():
+            future.cancel()
+            continue
+        
+        comment_rows[id(row)] = [
+            dict(comment, source=f"r/{subreddit}", thread_id=row["thread_id"])
+            for comment in future.result()
+        ]
+    
+    combined = []
+    for row in posts:
+        combined.append(row)
+        combined.extend(comment_rows.get(id(row), []))
+    
+    print(f"r/{subreddit}: {len(combined) - len(posts)} comments")
+    
+    return combined
 
-def fetch_news_rss(type, mu_only, limit_per_feed=50):
-    feeds = []
+def fetch_news_rss(type, mu_only, limit_per_feed=50, client=None, stats=None, incremental=False, store=None, cancel_event=None, output_format="csv", collapse_duplicates=True):
+    feeds = feeds_for(type)
     
-    if type == "mu":
-        feeds = MU_NEWS_FEEDS
-    elif type == "gen":
-        feeds = GENERAL_NEWS_FEEDS
-    else:
-        messagebox.showerror("error")
+    client = client or http_client.default_client()
     
     Path("data/news").mkdir(parents=True, exist_ok=True)
     all_articles = []
     
     source_counts = {}
-
-    for feed_url in feeds:
-        
-        feed = feedparser.parse(feed_url)
-        source_name = normalise_source(feed)
-        print(f"\nFeed: {feed_url} -> {len(feed.entries)} entries, source: {source_name}")
-        
-        for entry in feed.entries[:limit_per_feed]:
-            
-            text = get_entry_text(entry)
-            
-            if mu_only:
-                include = True
-            else:
-                include = any(keyword in text for keyword in MANCHESTER_UNITED_KEYWORDS)
-            if not include:
-                print(f"    Skipped (no keyword match)")
-                continue
-                
-            cleaned = clean_text(entry.title)
-                
-            if cleaned:
-                all_articles.append({
-                    "date": datetime(*entry.published_parsed[:6]).strftime("%Y-%m-%d"),
-                    "text": cleaned,
-                    "source": source_name
-                })
-                print(f"    Added: '{cleaned[:50]}...'")
-                
-                source_counts[source_name] = source_counts.get(source_name, 0) + 1
-
-    df = pd.DataFrame(all_articles)
+    
+    feed_cache = load_feed_cache()
     
     output_file = ""
         
@@ -307,12 +374,207 @@ def fetch_news_rss(type, mu_only, limit_per_feed=50):
         
         output_file = "data/news/general_articles.csv"
     
+    output_file = columnar.data_path(output_file, output_format)
     
-    df.to_csv(output_file, index=False, encoding="utf-8")
+    seen = SeenIndex(output_file) if incremental else None
     
+    def fetch(feed_url):
+        if cancel_event is not None and cancel_event.is_set():
+            return None, {"status": "cancelled", "bytes": 0, "seconds": 0}
+        return fetch_feed(client, feed_url, feed_cache.get(feed_url))
+
+    # results come back in feed order, so the output matches a sequential run
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_FEED_WORKERS, len(feeds)))) as pool:
+        results = list(pool.map(fetch, feeds))
+    
+    if cancel_event is not None and cancel_event.is_set():
+        return 0, source_counts
+
+    fetched = {}
+    
+    for feed_url, (cached, info) in zip(feeds, results):
+        
+        if cached is None:
+            print(f"\nFeed: {feed_url} -> failed ({info['status']})")
+            if stats is not None:
+                stats[feed_url] = info
+            continue
+        
+        fetched[feed_url] = cached
+        source_name = cached["source"]
+        entries = cached["entries"]
+        
+        if stats is not None:
+            stats[feed_url] = dict(info, source=source_name)
+        
+        print(f"\nFeed: {feed_url} -> {len(entries)} entries, source: {source_name}, "
+              f"status {info['status']}, {info['bytes']} bytes in {info['seconds']}s")
+        
+        for row in news_rows(entries[:limit_per_feed], source_name, mu_only, seen):
+            all_articles.append(row)
+            source_counts[source_name] = source_counts.get(source_name, 0) + 1
+
+    save_feed_cache(fetched)
+
+    df = pd.DataFrame(all_articles)
+    
+    # source_counts above still counts every feed that carried a story
+    if collapse_duplicates and not df.empty:
+        df = dedup.collapse(df)
+        print(f"\nCollapsed {len(all_articles)} articles into {len(df)} stories")
+    
+    save_collected(df, output_file, seen, store)
     
     return len(df), source_counts
 
+def news_rows(entries, source_name, mu_only, seen=None):
+    
+    # the cleaning and keyword filter stage for one feed's entries
+    
+    for entry in entries:
+        
+        # an entry without a published or updated date can't be dated
+        if not entry.get("published"):
+            print(f"    Skipped (no date)")
+            continue
+        
+        if seen is not None and not seen.add(entry.get("id") or entry["title"]):
+            continue
+        
+        text = entry["text"]
+        
+        if mu_only:
+            include = True
+        else:
+            include = KEYWORD_INDEX.contains(text)
+        if not include:
+            print(f"    Skipped (no keyword match)")
+            continue
+            
+        cleaned = clean_text(entry["title"])
+            
+        if cleaned:
+            print(f"    Added: '{cleaned[:50]}...'")
+            yield {
+                "date": datetime(*entry["published"][:6]).strftime("%Y-%m-%d"),
+                "text": cleaned,
+                "source": source_name
+            }
+
+def save_collected(df, output_file, seen=None, store=None):
+    
+    # a full run rewrites the file and drops the incremental state, so does
+    # the first incremental run as there is no index of what the file holds
+    
+    if seen is None or not seen.path.exists():
+        reset_incremental(output_file)
+        columnar.write_table(df, output_file)
+    elif not df.empty:
+        # only csv can be appended to in place, and only with the same columns
+        if columnar.file_format(output_file) == "csv" and csv_columns(output_file) in ([], list(df.columns)):
+            df.to_csv(output_file, mode="a", header=not has_header(output_file), index=False, encoding="utf-8")
+        else:
+            columnar.append_table(df, output_file)
+    
+    if seen is not None:
+        seen.save()
+    
+    if store is not None and not df.empty:
+        store.add_items(Path(output_file).stem, df)
+
+def has_header(csv_path):
+    if not Path(csv_path).exists():
+        return False
+    
+    with open(csv_path, encoding="utf-8") as f:
+        return bool(f.readline().strip())
+
+def csv_columns(csv_path):
+    if not has_header(csv_path):
+        return []
+    return list(pd.read_csv(csv_path, nrows=0).columns)
+
+def fetch_feed(client, feed_url, cached=None):
+    
+    # sends back the validators from the last download so unchanged feeds
+    # answer 304 and the entries saved last time are reused without parsing
+    
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("modified"):
+            headers["If-Modified-Since"] = cached["modified"]
+    
+    start = time.perf_counter()
+    
+    try:
+        r = client.get(feed_url, headers=headers, timeout=FEED_TIMEOUT)
+        
+        if r.status_code == 304 and cached:
+            info = {"status": 304, "bytes": len(r.content), "seconds": round(time.perf_counter() - start, 3)}
+            return cached, info
+        
+        r.raise_for_status()
+    except requests.RequestException as e:
+        info = {"status": type(e).__name__, "bytes": 0, "seconds": round(time.perf_counter() - start, 3)}
+        return None, info
+
+    feed = feedparser.parse(r.content, response_headers=dict(r.headers))
+    
+    cached = {
+        "etag": r.headers.get("ETag"),
+        "modified": r.headers.get("Last-Modified"),
+        "source": normalise_source(feed),
+        "entries": [
+            {
+                "id": entry.get("id") or entry.get("link") or entry.title,
+                "title": entry.title,
+                "text": get_entry_text(entry),
+                "published": entry_date(entry),
+            }
+            for entry in feed.entries
+        ],
+    }
+    
+    info = {"status": r.status_code, "bytes": len(r.content), "seconds": round(time.perf_counter() - start, 3)}
+    
+    return cached, info
+
+def entry_date(entry):
+    
+    # the published date, or the updated date of feeds that only give
+    # that, as a list so it can be saved in the feed cache. None if neither
+    
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    return list(parsed[:6]) if parsed else None
+
+def load_feed_cache():
+    path = Path(FEED_CACHE_FILE)
+    if not path.exists():
+        return {}
+    
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+
+def save_feed_cache(fetched):
+    
+    # merges the feeds one run fetched into the saved cache, so two
+    # analyses finishing at the same time keep each other's feeds, and
+    # renames a finished file into place so a reader never sees half of one
+    
+    with _feed_cache_lock:
+        feed_cache = load_feed_cache()
+        feed_cache.update(fetched)
+        
+        path = Path(FEED_CACHE_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_text(json.dumps(feed_cache), encoding="utf-8")
+        os.replace(temp, path)
+
 def get_entry_text(entry):
     parts = []
 
@@ -1,6 +1,3 @@
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
 """
 Donut Chart Visualisation Class
 
@@ -16,90 +13,188 @@ app when it is first run. Update method updates the chart with the
 sentiment information after it has passed through data collection and 
 sentiment analysis
 
+matplotlib is imported when the first chart is created rather than when
+this module is imported, so the app window can be shown before paying for it
+
+The wedges and labels are created once and update changes their angles
+and text in place rather than clearing and rebuilding the axes. Updates
+are applied at most once per FRAME_MS, a burst of updates inside one frame
+only draws the last one, updates that don't change the values are
+skipped, and the canvas is redrawn with draw_idle so Tk draws it when it
+is next idle rather than inside update
+
+A chart created with parent_frame=None draws to an offscreen Agg canvas
+and applies every update straight away. benchmark uses this to measure
+updates per second without a display:
+
+    python -m src.donut_chart
+
 """
 
+FRAME_MS = 16
+
+# positive, negative, neutral
+COLORS = ["#4caf50", "#f44336", "#9e9e9e"]
+LABEL_HEIGHTS = [0.25, -0.25, 0.0]
+EMPTY_COLOR = "#e0e0e0"
+
 class DonutChart:
     def __init__(self, parent_frame, bg_color="#ffdddd"):
+        from matplotlib.figure import Figure
+
         self.parent_frame = parent_frame
         self.bg_color = bg_color
-        
+
         self.fig = Figure(figsize=(3, 3), dpi=100, facecolor=self.bg_color)
         self.ax = self.fig.add_subplot(111)
-         
-        self.ax.set_facecolor(self.bg_color)
 
-        self.canvas = FigureCanvasTkAgg(self.fig, master=parent_frame)
-        self.canvas_widget = self.canvas.get_tk_widget()
-        self.canvas_widget.grid(row=0, column=0, padx=10, pady=10)
+        self.ax.set_facecolor(self.bg_color)
 
-        # Draw initial empty donut (0%)
-        self.update(0, 0, 0)
+        if parent_frame is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self.canvas = FigureCanvasAgg(self.fig)
+            self.canvas_widget = None
+        else:
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.canvas = FigureCanvasTkAgg(self.fig, master=parent_frame)
+            self.canvas_widget = self.canvas.get_tk_widget()
+            self.canvas_widget.grid(row=0, column=0, padx=10, pady=10)
 
-    def update(self, positive_percent, negative_percent, neutral_percent):
-        
-        self.ax.clear()
-        self.ax.set_facecolor(self.bg_color)
+        self.values = None
+        self.draws = 0
+        self._pending = None
+        self._scheduled = None
 
-        values = [positive_percent, negative_percent, neutral_percent]
-        total = sum(values)
+        self._build()
 
-        if total == 0:
-            values = [1]
-            colors = ["#e0e0e0"]
-            self.ax.pie(
-                values,
-                startangle=90,
-                colors=colors,
-                wedgeprops=dict(width=0.3, edgecolor="black")
-            )
+        # Draw initial empty donut (0%)
+        self.update(0, 0, 0)
+        self.flush()
 
-            self.ax.text(
-                0, 0,
-                "0%",
-                ha="center",
-                va="center",
-                fontsize=16,
-                fontweight="bold"
-            )
-        else:
-            colors = ["#4caf50", "#f44336", "#9e9e9e"]
+    def _build(self):
 
-            self.ax.pie(
-                values,
-                startangle=90,
-                colors=colors,
-                wedgeprops=dict(width=0.3, edgecolor="black")
-            )
+        # one wedge and label per sentiment, plus the grey ring and "0%"
+        # shown when there is nothing to chart
 
-            self.ax.text(
-                0, 0.25,
-                f"{positive_percent:.0f}%",
-                ha="center",
-                va="center",
-                fontsize=14,
-                fontweight="bold",
-                color="#4caf50"
-            )
+        wedges, _ = self.ax.pie(
+            [1, 1, 1, 1],
+            startangle=90,
+            colors=COLORS + [EMPTY_COLOR],
+            wedgeprops=dict(width=0.3, edgecolor="black")
+        )
+        self.wedges, self.empty_wedge = wedges[:3], wedges[3]
+        self.empty_wedge.set_theta1(90)
+        self.empty_wedge.set_theta2(450)
 
+        self.labels = [
             self.ax.text(
-                0, 0.0,
-                f"{neutral_percent:.0f}%",
+                0, height,
+                "",
                 ha="center",
                 va="center",
                 fontsize=14,
                 fontweight="bold",
-                color="#9e9e9e"
+                color=color
             )
+            for color, height in zip(COLORS, LABEL_HEIGHTS)
+        ]
+
+        self.empty_label = self.ax.text(
+            0, 0,
+            "0%",
+            ha="center",
+            va="center",
+            fontsize=16,
+            fontweight="bold"
+        )
 
-            self.ax.text(
-                0, -0.25,
-                f"{negative_percent:.0f}%",
-                ha="center",
-                va="center",
-                fontsize=14,
-                fontweight="bold",
-                color="#f44336"
-            )
-            
         self.ax.axis("equal")
-        self.canvas.draw()
\ No newline at end of file
+
+    def update(self, positive_percent, negative_percent, neutral_percent):
+
+        # only the latest values are kept until the next frame
+
+        self._pending = (float(positive_percent), float(negative_percent), float(neutral_percent))
+
+        if self.canvas_widget is None:
+            self.flush()
+        elif self._scheduled is None:
+            self._scheduled = self.canvas_widget.after(FRAME_MS, self._on_frame)
+
+    def _on_frame(self):
+        self._scheduled = None
+        self.flush()
+
+    def flush(self):
+
+        # applies a pending update now rather than at the next frame
+
+        if self._scheduled is not None:
+            self.canvas_widget.after_cancel(self._scheduled)
+            self._scheduled = None
+
+        values, self._pending = self._pending, None
+
+        if values is None or values == self.values:
+            return
+
+        self._render(values)
+        self.values = values
+        self.draws += 1
+        self.canvas.draw_idle()
+
+    def _render(self, values):
+        total = sum(values)
+        empty = total == 0
+
+        self.empty_wedge.set_visible(empty)
+        self.empty_label.set_visible(empty)
+
+        # the same angles ax.pie gives, counterclockwise from the top
+        theta = 90.0
+        for wedge, label, value in zip(self.wedges, self.labels, values):
+            share = 0.0 if empty else 360.0 * value / total
+
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + share)
+            wedge.set_visible(not empty)
+
+            label.set_text(f"{value:.0f}%")
+            label.set_visible(not empty)
+
+            theta += share
+
+def benchmark(charts=4, updates=400, seed=0):
+
+    # updates per second of offscreen charts, for changing values (each one
+    # redrawn) and for repeated values (each one skipped)
+
+    import random
+    import time
+
+    rng = random.Random(seed)
+    donuts = [DonutChart(None) for _ in range(charts)]
+
+    start = time.perf_counter()
+    for i in range(updates):
+        positive = rng.uniform(0, 100)
+        negative = rng.uniform(0, 100 - positive)
+        donuts[i % charts].update(positive, negative, 100 - positive - negative)
+    changed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(updates):
+        donut = donuts[i % charts]
+        donut.update(*donut.values)
+    unchanged = time.perf_counter() - start
+
+    return {
+        "charts": charts,
+        "updates": updates,
+        "changed_per_second": round(updates / changed, 1),
+        "unchanged_per_second": round(updates / unchanged, 1),
+        "draws": sum(donut.draws for donut in donuts),
+    }
+
+if __name__ == "__main__":
+    print(benchmark())
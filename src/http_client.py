@@ -0,0 +1,289 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+"""
+HTTP Client Module
+
+Shared HTTP access for the data collection module
+
+Wraps a single requests.Session so connections to Reddit and the news
+feeds are kept alive and reused between requests, and between button
+presses, rather than opening a new connection for every page
+
+Requests are throttled per host using a simple token bucket, so that
+fetching several subreddits at the same time still stays within what
+Reddit allows for clients without a developer account. Hosts without an
+entry in HOST_RATE_LIMITS are not throttled
+
+Anything with a get(url, **kwargs) method returning a requests.Response
+can be used as a client, which three wrappers build on:
+
+- CachingClient keeps successful responses on disk for CACHE_TTL seconds,
+  so pressing a button twice within a minute doesn't download the same
+  Reddit pages and feeds again. default_client() uses one. Once an entry
+  has expired the request goes to the server with the caller's
+  conditional headers, a 304 is passed back to the caller (and keeps the
+  cached entry for another CACHE_TTL if it matches the validators sent).
+  Entries older than CACHE_MAX_AGE are deleted, checked at most every
+  PRUNE_INTERVAL seconds, so Reddit's after= pages and comment URLs don't
+  pile up run after run
+- RecordingClient fetches live and saves every raw response as a JSON
+  fixture
+- ReplayClient serves those fixtures back without any network access, a
+  request that wasn't recorded fails like a connection error would, so
+  the whole pipeline can be run and benchmarked offline and repeatably
+
+Responses are keyed on the method, the full URL with its query string and
+any Accept header. Conditional headers (If-None-Match / If-Modified-Since)
+are not sent when recording, so full bodies are always stored. Only 200
+responses are cached
+
+"""
+
+USER_AGENT = "windows:manchester-united-sentiment-uni-project:v1.0"
+
+# requests per second, burst size
+HOST_RATE_LIMITS = {
+    "www.reddit.com": (1.0, 2),
+}
+
+POOL_SIZE = 10
+
+HTTP_CACHE_DIR = "data/cache/http"
+CACHE_TTL = 60
+CACHE_MAX_AGE = 24 * 3600
+PRUNE_INTERVAL = 600
+
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+# the saved body is already decompressed, so these no longer describe it
+TRANSFER_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding")
+
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+
+        # a token is reserved under the lock and the sleep happens outside
+        # it, so waiting threads queue up one interval apart
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if delay:
+            time.sleep(delay)
+
+class HttpClient:
+    def __init__(self, rate_limits=None, pool_size=POOL_SIZE):
+        self.rate_limits = HOST_RATE_LIMITS if rate_limits is None else rate_limits
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def _limiter(self, host):
+        with self._lock:
+            if host not in self._limiters:
+                limit = self.rate_limits.get(host)
+                self._limiters[host] = RateLimiter(*limit) if limit else None
+            return self._limiters[host]
+
+    def get(self, url, **kwargs):
+        limiter = self._limiter(urlsplit(url).netloc)
+        if limiter:
+            limiter.wait()
+
+        return self.session.get(url, **kwargs)
+
+class CachingClient:
+    def __init__(self, client=None, cache_dir=HTTP_CACHE_DIR, ttl=CACHE_TTL, max_age=CACHE_MAX_AGE):
+        self.client = client or HttpClient()
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_age = max_age
+
+        self._pruned = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        self._prune_due()
+
+        path = self.cache_dir / f"{request_key(url, **kwargs)}.json"
+
+        if path.exists() and time.time() - path.stat().st_mtime < self.ttl:
+            try:
+                return load_response(path)
+            except (ValueError, KeyError, OSError):
+                pass
+
+        response = self.client.get(url, **kwargs)
+
+        if response.status_code == 200:
+            save_response(path, response)
+        elif response.status_code == 304:
+            self._revalidated(path, kwargs.get("headers"))
+        return response
+
+    def _revalidated(self, path, headers):
+
+        # the server says the caller's copy is current, the cached entry is
+        # only kept for longer if it is that same copy
+
+        sent = CaseInsensitiveDict(headers or {})
+
+        try:
+            stored = load_response(path).headers
+        except (ValueError, KeyError, OSError):
+            return
+
+        etag = sent.get("If-None-Match")
+        modified = sent.get("If-Modified-Since")
+
+        if (etag and stored.get("ETag") == etag) or (not etag and modified and stored.get("Last-Modified") == modified):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def _prune_due(self):
+        with self._lock:
+            if time.time() - self._pruned < PRUNE_INTERVAL:
+                return
+            self._pruned = time.time()
+
+        self.prune()
+
+    def prune(self):
+
+        # deletes entries (and temporary files left by an interrupted
+        # write) older than max_age, returns how many were deleted
+
+        if not self.cache_dir.exists():
+            return 0
+
+        cutoff = time.time() - self.max_age
+        deleted = 0
+
+        for path in self.cache_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+            except OSError:
+                pass
+
+        return deleted
+
+class RecordingClient:
+    def __init__(self, fixtures_dir, client=None):
+        self.client = client or HttpClient()
+        self.fixtures_dir = Path(fixtures_dir)
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, **without_conditional(kwargs))
+        save_response(self.fixtures_dir / f"{request_key(url, **kwargs)}.json", response)
+        return response
+
+class ReplayClient:
+    def __init__(self, fixtures_dir):
+        self.fixtures_dir = Path(fixtures_dir)
+
+    def get(self, url, **kwargs):
+        path = self.fixtures_dir / f"{request_key(url, **kwargs)}.json"
+
+        if not path.exists():
+            raise requests.ConnectionError(f"No recorded response for {url}")
+
+        return load_response(path)
+
+def request_key(url, params=None, headers=None, **kwargs):
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    accept = CaseInsensitiveDict(headers or {}).get("Accept", "")
+    return hashlib.sha1(f"GET {full_url} {accept}".encode("utf-8")).hexdigest()
+
+def without_conditional(kwargs):
+    headers = CaseInsensitiveDict(kwargs.get("headers") or {})
+    for name in CONDITIONAL_HEADERS:
+        headers.pop(name, None)
+    return dict(kwargs, headers=dict(headers))
+
+def save_response(path, response):
+    content = response.content
+
+    try:
+        body = {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        body = {"base64": base64.b64encode(content).decode("ascii")}
+
+    record = {
+        "url": response.url,
+        "status": response.status_code,
+        "headers": {name: value for name, value in response.headers.items() if name.title() not in TRANSFER_HEADERS},
+        "encoding": response.encoding,
+        **body,
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # written to a temporary file first so a reader never sees half a record
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(record), encoding="utf-8")
+    tmp.replace(path)
+
+def load_response(path):
+    record = json.loads(Path(path).read_text(encoding="utf-8"))
+
+    response = requests.Response()
+    response.url = record["url"]
+    response.status_code = record["status"]
+    response.headers = CaseInsensitiveDict(record["headers"])
+    response.encoding = record["encoding"]
+
+    if "base64" in record:
+        response._content = base64.b64decode(record["base64"])
+    else:
+        response._content = record["text"].encode("utf-8")
+
+    return response
+
+_default_client = None
+_default_lock = threading.Lock()
+
+def default_client():
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = CachingClient(HttpClient())
+        return _default_client
+
+def set_default_client(client):
+
+    # e.g. set_default_client(ReplayClient("fixtures/run1")) to run offline
+
+    global _default_client
+    with _default_lock:
+        _default_client = client
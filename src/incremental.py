@@ -0,0 +1,84 @@
+import json
+import threading
+from pathlib import Path
+
+"""
+Incremental Collection Module
+
+Keeps the small amount of state needed to refresh a dataset incrementally
+rather than rebuilding it from scratch on every run
+
+Two sidecar files sit next to each collected CSV:
+
+- <csv>.seen.json  - the Reddit post IDs / RSS article GUIDs already
+  collected, so data collection only appends rows it hasn't seen before
+- <csv>.state.json - how many rows of the CSV have been scored and the
+  running count of each sentiment label, so sentiment analysis only scores
+  the rows appended since the last run and the donut percentages come
+  straight from the stored counts
+
+A full (non incremental) collection rewrites the CSV, so reset() is called
+to drop both sidecars and keep them consistent with the file
+
+"""
+
+SENTIMENT_LABELS = ["Positive", "Negative", "Neutral"]
+
+class SeenIndex:
+    def __init__(self, csv_path):
+        self.path = Path(f"{csv_path}.seen.json")
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self._ids = set(json.loads(self.path.read_text(encoding="utf-8")))
+        else:
+            self._ids = set()
+
+    def __contains__(self, item_id):
+        return item_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, item_id):
+
+        # returns False if the id had already been seen
+
+        with self._lock:
+            if item_id in self._ids:
+                return False
+            self._ids.add(item_id)
+            return True
+
+    def save(self):
+        self.path.write_text(json.dumps(sorted(self._ids)), encoding="utf-8")
+
+def load_state(csv_path):
+    path = Path(f"{csv_path}.state.json")
+
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    return {
+        "scored_rows": 0,
+        "counts": {label: 0 for label in SENTIMENT_LABELS},
+    }
+
+def save_state(csv_path, state):
+    Path(f"{csv_path}.state.json").write_text(json.dumps(state), encoding="utf-8")
+
+def reset(csv_path):
+    for suffix in (".seen.json", ".state.json"):
+        Path(f"{csv_path}{suffix}").unlink(missing_ok=True)
+
+def percentages_from_counts(counts):
+    total = sum(counts.values())
+
+    if total == 0:
+        return 0, 0, 0
+
+    return (
+        counts["Positive"] / total * 100,
+        counts["Negative"] / total * 100,
+        counts["Neutral"] / total * 100,
+    )
@@ -0,0 +1,141 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Background Jobs Module
+
+Runs the long analysis pipelines off the Tkinter main thread so the window
+stays responsive while posts are fetched and scored
+
+Tkinter widgets may only be touched from the thread running mainloop, so
+worker threads never call back into the GUI directly. Instead they post
+progress, results and errors onto a queue which the runner drains from the
+main thread every POLL_MS milliseconds using root.after, and the callbacks
+given to submit() are run from there
+
+Cancellation is cooperative. Cancelling a job sets its cancel_event, which
+the data collection functions check between pages and feeds, and the job
+itself calls check() between stages to stop at the next opportunity
+
+Each job has a name and only one job per name can run at a time, different
+names run side by side up to MAX_WORKERS
+
+shutdown() cancels every job and stops polling, no callback runs after it
+(their widgets may already be destroyed) so it is safe to call just before
+destroying the window the runner was created for
+
+"""
+
+POLL_MS = 100
+MAX_WORKERS = 4
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    def __init__(self, name, events, on_done=None, on_error=None, on_progress=None, on_cancel=None):
+        self.name = name
+        self.cancel_event = threading.Event()
+
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+
+        self._events = events
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def progress(self, message):
+        self._events.put((self, "progress", message))
+
+class JobRunner:
+    def __init__(self, root, max_workers=MAX_WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._events = queue.Queue()
+        self._jobs = {}
+        self._stopped = False
+
+        self._after_id = self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, name, work, **callbacks):
+
+        # work is called on a worker thread with the Job as its only argument,
+        # callbacks (on_done, on_error, on_progress, on_cancel) run on the main thread
+
+        if self.is_running(name):
+            raise RuntimeError(f"Job '{name}' is already running")
+
+        job = Job(name, self._events, **callbacks)
+        self._jobs[name] = job
+        self._pool.submit(self._run, job, work)
+        return job
+
+    def is_running(self, name):
+        return name in self._jobs
+
+    def cancel(self, name):
+        job = self._jobs.get(name)
+        if job:
+            job.cancel()
+
+    def shutdown(self):
+        self._stopped = True
+
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+        for job in self._jobs.values():
+            job.cancel()
+        self._pool.shutdown(wait=False)
+
+    def _run(self, job, work):
+        try:
+            result = work(job)
+            job.check()
+            self._events.put((job, "done", result))
+        except JobCancelled:
+            self._events.put((job, "cancelled", None))
+        except Exception as e:
+            self._events.put((job, "error", e))
+
+    def _poll(self):
+        self._after_id = None
+
+        while not self._stopped:
+            try:
+                job, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if job.on_progress:
+                    job.on_progress(value)
+                continue
+
+            self._jobs.pop(job.name, None)
+
+            if kind == "done" and job.on_done:
+                job.on_done(value)
+            elif kind == "error" and job.on_error:
+                job.on_error(value)
+            elif kind == "cancelled" and job.on_cancel:
+                job.on_cancel()
+
+        # a callback may have shut the runner down
+        if not self._stopped:
+            self._after_id = self.root.after(self.poll_ms, self._poll)
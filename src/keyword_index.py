@@ -0,0 +1,63 @@
+import re
+
+"""
+Keyword Index Module
+
+Compiles a keyword list once into a single regular expression that is used
+to decide whether a post or article is about the club
+
+Keywords are arranged into a character trie before being turned into a
+pattern, so keywords sharing a prefix ("man u", "man utd", "man united")
+share the same branch. Python's regex engine then only follows the branch
+the text actually takes rather than trying every keyword at every position,
+which keeps matching close to linear in the length of the text however
+many player and staff aliases are added
+
+Matches must start and end on a word boundary, so "man u" no longer
+matches inside "man utilises". A trailing "s" is allowed so possessives
+written without an apostrophe ("uniteds", "carricks") still match. Where
+keywords overlap the longest one is reported
+
+"""
+
+class KeywordIndex:
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.lower().strip() for keyword in keywords if keyword.strip()})
+
+        trie = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        body = _trie_pattern(trie) if self.keywords else "(?!)"
+        self.pattern = re.compile(r"(?<!\w)(?P<keyword>" + body + r")s?(?!\w)")
+
+    def contains(self, text):
+        return self.pattern.search(text.lower()) is not None
+
+    def matches(self, text):
+
+        # keywords found in the text, each listed once in order of appearance
+
+        found = dict.fromkeys(match.group("keyword") for match in self.pattern.finditer(text.lower()))
+        return list(found)
+
+def _trie_pattern(node):
+    optional = "" in node
+
+    alternatives = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char
+    ]
+
+    if not alternatives:
+        return ""
+
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+
+    # greedy optional group, so the longest keyword is tried first
+    return "(?:" + "|".join(alternatives) + ")" + ("?" if optional else "")
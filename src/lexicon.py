@@ -0,0 +1,183 @@
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+from importlib import metadata
+from pathlib import Path
+from src.nltk_resources import ensure_resource
+
+"""
+Lexicon Module
+
+Compiles the VADER lexicon, with the football overrides below, into a
+single binary file that the analyzer is built from
+
+SentimentIntensityAnalyzer() opens nltk's vader_lexicon zip and parses
+every line of the text file into a dict each time one is built, which is
+once per process and again in every scoring worker. build_lexicon does
+that parsing once and saves the finished dict, load_lexicon reads it back
+with a single unpickle
+
+The file is:
+
+- MAGIC, FORMAT_VERSION (2 bytes), then the sha256 of the payload
+- the payload, a pickled dict of the lexicon, the overrides it was built
+  with, the nltk version and digest (a sha1 of the sorted lexicon entries,
+  used as the score cache's lexicon version)
+
+A file with the wrong magic or format version, a checksum that doesn't
+match its payload (e.g. a half written file), built with different
+overrides or by a different nltk version is rebuilt rather than used.
+Each process writes to its own temporary file and renames it into place,
+so processes rebuilding at the same time don't trip over each other. The
+file lives in data/cache and is built the first time it's needed, or
+ahead of time with
+
+    python -m src.lexicon
+
+FOOTBALL_OVERRIDES replaces lexicon valences, e.g. {"united": 0.0} for a
+word that is part of club names. It is empty so the analyzer scores
+exactly as stock VADER does, an override changes the app's results and
+should only be added with validation results that show it helps
+
+"""
+
+LEXICON_FILE = "data/cache/vader_lexicon.bin"
+SOURCE_FILE = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+MAGIC = b"VADERLEX"
+FORMAT_VERSION = 1
+
+FOOTBALL_OVERRIDES = {}
+
+_header = struct.Struct(f"<{len(MAGIC)}sH32s")
+
+_loaded = {}
+_lock = threading.Lock()
+
+def parse_lexicon(text):
+
+    # the same parsing as SentimentIntensityAnalyzer.make_lex_dict
+
+    lexicon = {}
+    for line in text.split("\n"):
+        word, measure = line.strip().split("\t")[0:2]
+        lexicon[word] = float(measure)
+    return lexicon
+
+def lexicon_digest(lexicon):
+    entries = "\n".join(f"{word}\t{value!r}" for word, value in sorted(lexicon.items()))
+    return hashlib.sha1(entries.encode("utf-8")).hexdigest()
+
+def nltk_version():
+
+    # read from the package metadata, cheaper than importing nltk
+
+    return metadata.version("nltk")
+
+def build_lexicon(path=LEXICON_FILE, overrides=FOOTBALL_OVERRIDES):
+    ensure_resource("vader_lexicon")
+    import nltk
+
+    lexicon = parse_lexicon(nltk.data.load(SOURCE_FILE))
+    lexicon.update(overrides)
+
+    data = {
+        "lexicon": lexicon,
+        "overrides": dict(overrides),
+        "nltk": nltk.__version__,
+        "digest": lexicon_digest(lexicon),
+    }
+
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    header = _header.pack(MAGIC, FORMAT_VERSION, hashlib.sha256(payload).digest())
+
+    # written to a temporary file of this process and renamed, so a reader
+    # never sees half a file and two processes building at once don't
+    # rename each other's file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + payload)
+        os.replace(temp, path)
+    except BaseException:
+        Path(temp).unlink(missing_ok=True)
+        raise
+
+    return data
+
+def load_lexicon(path=LEXICON_FILE):
+
+    # raises ValueError if the file isn't a valid lexicon file of this format
+
+    content = Path(path).read_bytes()
+
+    if len(content) < _header.size:
+        raise ValueError(f"{path} is too short to be a lexicon file")
+
+    magic, version, checksum = _header.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a lexicon file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} is format version {version}, expected {FORMAT_VERSION}")
+
+    payload = memoryview(content)[_header.size:]
+    if hashlib.sha256(payload).digest() != checksum:
+        raise ValueError(f"{path} is corrupt, its checksum doesn't match")
+
+    return pickle.loads(payload)
+
+def get_lexicon(path=LEXICON_FILE, overrides=FOOTBALL_OVERRIDES):
+
+    # the compiled lexicon, loaded once per process and (re)built if the
+    # file is missing, invalid or was built with other overrides or by
+    # another nltk version
+
+    key = (str(path), tuple(sorted(overrides.items())))
+
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+
+        data = None
+        if Path(path).exists():
+            try:
+                data = load_lexicon(path)
+            except (ValueError, pickle.UnpicklingError) as e:
+                print(f"Rebuilding lexicon: {e}")
+
+        if data is not None and data["nltk"] != nltk_version():
+            print(f"Rebuilding lexicon: built by nltk {data['nltk']}, nltk {nltk_version()} is installed")
+            data = None
+
+        if data is None or data["overrides"] != overrides:
+            data = build_lexicon(path, overrides)
+
+        _loaded[key] = data
+        return data
+
+def build_analyzer(path=LEXICON_FILE, overrides=FOOTBALL_OVERRIDES):
+
+    # a SentimentIntensityAnalyzer over the compiled lexicon, without
+    # reading or parsing nltk's lexicon file
+
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer, VaderConstants
+
+    analyzer = SentimentIntensityAnalyzer.__new__(SentimentIntensityAnalyzer)
+    analyzer.lexicon_file = None
+    analyzer.lexicon = dict(get_lexicon(path, overrides)["lexicon"])
+    analyzer.constants = VaderConstants()
+    return analyzer
+
+def main(argv=None):
+    path = argv[0] if argv else LEXICON_FILE
+    data = build_lexicon(path)
+    print(f"Built {path}: {len(data['lexicon'])} entries, {len(data['overrides'])} overrides, digest {data['digest'][:12]}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
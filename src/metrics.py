@@ -0,0 +1,124 @@
+import numpy as np
+
+"""
+Metrics Module
+
+Confusion matrix and classification metrics for the validation tool,
+built on numpy rather than scikit-learn
+
+Labels are coded as integers and the confusion matrix is built with a
+single bincount over (actual, predicted) pairs, everything else (accuracy,
+precision, recall and F1 per label) is derived from that matrix
+
+Labels outside the given list (a missing or misspelt manual label) are
+counted in an extra "other" row and column. They are never correct but
+still count towards the totals, which is how sklearn treats them when
+passed an explicit labels list, so the results match sklearn's
+accuracy_score, precision_recall_fscore_support(average=None,
+zero_division=0) and confusion_matrix
+
+Bootstrap confidence intervals resample the confusion counts rather than
+the rows. Drawing n rows with replacement is the same as drawing the cell
+counts from a multinomial over the observed cell frequencies, so every
+resample is generated at once and the cost doesn't grow with the number of
+rows, and it works from counts alone (as collected by
+sentiment_analysis.analyze_csv_streaming)
+
+"""
+
+LABELS = ["Positive", "Negative", "Neutral"]
+
+BOOTSTRAP_RESAMPLES = 2000
+CONFIDENCE = 0.95
+
+def encode(values, labels=LABELS):
+
+    # label index, or len(labels) for anything not in labels
+
+    codes = {label: i for i, label in enumerate(labels)}
+    other = len(labels)
+    return np.fromiter((codes.get(value, other) for value in values), dtype=np.intp)
+
+def confusion_counts(y_true, y_pred, labels=LABELS):
+
+    # (k + 1) x (k + 1) counts, rows are actual and columns predicted, the
+    # last row and column are the "other" labels
+
+    size = len(labels) + 1
+    pairs = encode(y_true, labels) * size + encode(y_pred, labels)
+    return np.bincount(pairs, minlength=size * size).reshape(size, size)
+
+def counts_from_pairs(pairs, labels=LABELS):
+
+    # the same counts from a {(actual, predicted): count} mapping
+
+    size = len(labels) + 1
+    codes = {label: i for i, label in enumerate(labels)}
+    counts = np.zeros((size, size), dtype=np.int64)
+
+    for (actual, predicted), count in pairs.items():
+        counts[codes.get(actual, size - 1), codes.get(predicted, size - 1)] += count
+
+    return counts
+
+def confusion_matrix(y_true, y_pred, labels=LABELS):
+    k = len(labels)
+    return confusion_counts(y_true, y_pred, labels)[:k, :k]
+
+def scores_from_counts(counts):
+
+    # counts is one (k + 1) x (k + 1) matrix or a stack of them, any
+    # leading dimensions carry through to the results
+
+    counts = np.asarray(counts, dtype=float)
+    k = counts.shape[-1] - 1
+
+    true_positive = np.diagonal(counts, axis1=-2, axis2=-1)[..., :k]
+    predicted = counts.sum(axis=-2)[..., :k]
+    actual = counts.sum(axis=-1)[..., :k]
+    total = counts.sum(axis=(-2, -1))
+
+    precision = _divide(true_positive, predicted)
+    recall = _divide(true_positive, actual)
+    f1 = _divide(2 * precision * recall, precision + recall)
+
+    return {
+        "total": total,
+        "correct": true_positive.sum(axis=-1),
+        "accuracy": _divide(true_positive.sum(axis=-1), total),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+    }
+
+def classification_scores(y_true, y_pred, labels=LABELS):
+    return scores_from_counts(confusion_counts(y_true, y_pred, labels))
+
+def bootstrap_intervals(counts, n_resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=None):
+
+    # percentile intervals for each score, as (low, high) pairs of arrays
+    # shaped like the score itself
+
+    counts = np.asarray(counts)
+    total = int(counts.sum())
+
+    if total == 0:
+        return {}
+
+    rng = np.random.default_rng(seed)
+    resampled = rng.multinomial(total, counts.ravel() / total, size=n_resamples).reshape((n_resamples,) + counts.shape)
+    scores = scores_from_counts(resampled)
+
+    tail = (1 - confidence) / 2 * 100
+    return {
+        name: tuple(np.percentile(values, [tail, 100 - tail], axis=0))
+        for name, values in scores.items()
+        if name in ("accuracy", "precision", "recall", "f1")
+    }
+
+def _divide(numerator, denominator):
+
+    # 0 wherever the denominator is 0, like sklearn's zero_division=0
+
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator != 0)
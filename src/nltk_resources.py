@@ -0,0 +1,43 @@
+import threading
+
+"""
+NLTK Resources Module
+
+Makes sure the NLTK data the app needs is available, without touching the
+network when it already is
+
+nltk.download was previously called unconditionally at import, which
+checks the remote index on every start and fails (printing errors) when
+offline. ensure_resource only downloads when nltk.data.find can't locate
+a local copy, and remembers what has been checked so it costs nothing
+after the first call
+
+nltk itself is imported inside the functions here, importing it pulls in
+a large part of scipy and takes longer than the rest of the app together,
+so it's only paid for the first time text is actually cleaned or scored
+
+"""
+
+RESOURCES = {
+    "vader_lexicon": "sentiment/vader_lexicon.zip",
+    "stopwords": "corpora/stopwords",
+}
+
+_checked = set()
+_lock = threading.Lock()
+
+def ensure_resource(name):
+    import nltk
+
+    with _lock:
+        if name in _checked:
+            return
+
+        try:
+            nltk.data.find(RESOURCES[name])
+        except LookupError:
+            print(f"NLTK resource '{name}' not found locally, downloading")
+            if not nltk.download(name, quiet=True):
+                raise LookupError(f"Could not download NLTK resource '{name}'")
+
+        _checked.add(name)
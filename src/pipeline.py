@@ -0,0 +1,114 @@
+import time
+from src import columnar, data_collection, incremental, sentiment_analysis
+
+"""
+Pipeline Module
+
+Runs one of the four analyses end to end: fetch (which also cleans and
+keyword filters), score and aggregate, timing each stage
+
+This is the same sequence the GUI buttons run, kept free of any tkinter or
+matplotlib imports so it can also be driven headless from cli.py
+
+ANALYSES maps each analysis name to the collector that feeds it and the
+CSV it writes, the names match the sections used by the GUI. With an
+output_format of "parquet" or "arrow" the same path is used with that
+suffix, and scoring only reads back the columns in READ_COLUMNS
+
+comments=True also collects the top comments of each Reddit post, the
+run then weights the rows (see sentiment_analysis.comment_weights) so the
+percentages are weighted and the summary gains a weighted_compound. The
+running counts of an incremental run are unweighted label counts, so
+comments can't be combined with incremental_mode
+
+"""
+
+ANALYSES = {
+    "mu_reddit": {"collector": "reddit", "type": "mu", "mu_only": True, "csv": "data/reddit/mu_posts.csv"},
+    "general_reddit": {"collector": "reddit", "type": "gen", "mu_only": False, "csv": "data/reddit/general_posts.csv"},
+    "mu_news": {"collector": "news", "type": "mu", "mu_only": True, "csv": "data/news/mu_articles.csv"},
+    "general_news": {"collector": "news", "type": "gen", "mu_only": False, "csv": "data/news/general_articles.csv"},
+}
+
+READ_COLUMNS = ["date", "text", "source"]
+
+def run_pipeline(name, incremental_mode=False, workers=1, cache=None, store=None, cancel_event=None, progress=None, output_format="csv", comments=False):
+
+    # returns a summary dict, or None if cancel_event was set part way through
+
+    analysis = ANALYSES[name]
+    path = columnar.data_path(analysis["csv"], output_format)
+
+    weighted = comments and analysis["collector"] == "reddit"
+
+    if weighted and incremental_mode:
+        raise ValueError("comments can't be collected in incremental mode, its running counts aren't weighted")
+    timings = {}
+
+    def report(message):
+        if progress:
+            progress(message)
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    report("Collecting...")
+    start = time.perf_counter()
+
+    options = {}
+    if analysis["collector"] == "reddit":
+        fetch = data_collection.fetch_reddit_json
+        options["comments"] = comments
+    else:
+        fetch = data_collection.fetch_news_rss
+
+    total_count, source_counts = fetch(
+        analysis["type"], analysis["mu_only"],
+        incremental=incremental_mode, store=store, cancel_event=cancel_event,
+        output_format=output_format, **options
+    )
+    timings["fetch"] = time.perf_counter() - start
+
+    if cancelled():
+        return None
+
+    report("Scoring...")
+    start = time.perf_counter()
+
+    # a full run that collected nothing leaves an empty CSV with nothing to score
+    if incremental_mode:
+        df, counts = sentiment_analysis.analyze_csv_incremental(path, workers, cache, store)
+    elif total_count:
+        df = sentiment_analysis.analyze_csv_sentiment(
+            path, workers, cache, store,
+            columns=None if weighted else READ_COLUMNS,
+            apply_weighting=weighted
+        )
+    timings["score"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    if incremental_mode:
+        pos_percent, neg_percent, neu_percent = incremental.percentages_from_counts(counts)
+    elif not total_count:
+        pos_percent, neg_percent, neu_percent = 0, 0, 0
+    else:
+        pos_percent, neg_percent, neu_percent = sentiment_analysis.sentiment_percentages(df, weighted)
+    timings["aggregate"] = time.perf_counter() - start
+
+    summary = {
+        "analysis": name,
+        "total": total_count,
+        "sources": source_counts,
+        "percentages": {
+            "positive": float(pos_percent),
+            "negative": float(neg_percent),
+            "neutral": float(neu_percent),
+        },
+        "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    }
+
+    if weighted and total_count:
+        summary["weighted_compound"] = sentiment_analysis.weighted_compound(df)
+
+    return summary
@@ -1,10 +1,7 @@
 import re
+from functools import lru_cache
 import pandas as pd
-import nltk
-from nltk.corpus import stopwords
-
-nltk.download("stopwords")
-
+from src.nltk_resources import ensure_resource
 
 """
 Text Preprocessing Module
@@ -20,28 +17,75 @@ The cleaning process:
 - Removes common English stopwords
 - Normalises whitespace
 
+The patterns are compiled once at import and run as three passes, in
+this order: URLs (a mention or entity pattern could otherwise match
+part of a URL first), then users and subreddits (removing one can complete
+an HTML entity, "&amp@x;" becomes "&amp;"), then HTML entities and
+unwanted characters together. Splitting and re-joining on whitespace for
+the stopword filter also normalises the whitespace
+
+The stopword list is loaded by stop_words() the first time it's needed
+rather than at import, so importing this module doesn't import nltk
+
+clean_series applies the same steps to a whole pandas Series, running
+each pattern once over the whole column rather than once per row
+
 Future consideration for language, Manchester united has a global following
 so look to incorporate feedback in languages other than english
 
 
 """
 
-STOP_WORDS = set(stopwords.words("english"))
+URL_PATTERN = re.compile(r"http\S+|www\S+")
+MENTION_PATTERN = re.compile(r"@\w+|u/\w+|r/\w+")
+NOISE_PATTERN = re.compile(r"&\w+;|[^a-zA-Z0-9\s!?.,]")
+
+@lru_cache(maxsize=None)
+def stop_words():
+    ensure_resource("stopwords")
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words("english"))
+
+def __getattr__(name):
+
+    # keeps preprocessing.STOP_WORDS working for existing callers
+
+    if name == "STOP_WORDS":
+        return stop_words()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clean_text(text: str) -> str:
     if not text or pd.isna(text):
         return ""
 
-    text = text.lower()
+    text = strip_noise(text.lower())
+
+    return remove_stop_words(text.split())
 
-    text = re.sub(r"http\S+|www\S+", "", text)
-    text = re.sub(r"@\w+|u/\w+|r/\w+", "", text)
-    text = re.sub(r"&\w+;", "", text)
-    text = re.sub(r"[^a-zA-Z0-9\s!?.,]", "", text)
+def strip_noise(text):
+    return NOISE_PATTERN.sub("", MENTION_PATTERN.sub("", URL_PATTERN.sub("", text)))
 
-    text = " ".join(
-        word for word in text.split()
-        if word not in STOP_WORDS
+def remove_stop_words(words):
+    excluded = stop_words()
+    return " ".join(
+        word for word in words
+        if word not in excluded
     )
 
-    return re.sub(r"\s+", " ", text).strip()
\ No newline at end of file
+def clean_series(texts: pd.Series) -> pd.Series:
+    
+    # the column is joined into one newline separated string so lowercasing
+    # and the regex passes run once over all rows instead of once per row.
+    # Newlines inside a text are swapped for spaces first, which none of the
+    # patterns treat differently, so rows can be split apart again exactly.
+    # Missing or empty values come out as "" the same as clean_text
+    
+    rows = texts.fillna("").astype(str).str.replace("\n", " ", regex=False)
+    
+    joined = strip_noise("\n".join(rows).lower())
+    
+    return pd.Series(
+        [remove_stop_words(row.split()) for row in joined.split("\n")],
+        index=texts.index,
+        dtype=object
+    )
\ No newline at end of file
@@ -0,0 +1,165 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+"""
+Score Cache Module
+
+Persistent cache of VADER scores so that text which has already been
+scored is not scored again on the next button press
+
+VADER is deterministic for a given text and lexicon, so scores are keyed
+by a hash of the cleaned text together with the lexicon version. Changing
+the lexicon therefore invalidates every cached score without having to
+clear the cache by hand
+
+The cache has two levels:
+
+- A small in-memory LRU that serves repeats within a session
+- An SQLite file on disk that survives between runs
+
+The disk cache is bounded by max_entries, once it grows past that the
+least recently used scores are evicted until EVICT_TO of max_entries are
+left. The entries are counted once when the cache is opened and then kept
+as a running upper bound (a replaced row is counted again), the table is
+only counted again when that bound passes max_entries, so writes don't
+scan the whole table. Memory hits, disk hits and misses are counted and
+available through stats()
+
+"""
+
+SCORE_CACHE_FILE = "data/cache/scores.sqlite3"
+
+MEMORY_SIZE = 10000
+MAX_ENTRIES = 500000
+EVICT_TO = 0.9
+
+class ScoreCache:
+    def __init__(self, path=SCORE_CACHE_FILE, lexicon_version="", memory_size=MEMORY_SIZE, max_entries=MAX_ENTRIES):
+        self.lexicon_version = lexicon_version
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "key TEXT PRIMARY KEY, compound REAL, neg REAL, neu REAL, pos REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores(last_used)")
+        self._conn.commit()
+
+        self._entries = self._count()
+
+    def key(self, text):
+        return hashlib.blake2b(
+            f"{self.lexicon_version}\0{text}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def get_many(self, texts):
+
+        # returns {text: scores} for every text that is cached, texts that
+        # are missing are simply left out
+
+        found = {}
+        disk_keys = {}
+
+        with self._lock:
+            for text in set(texts):
+                key = self.key(text)
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_keys[key] = text
+
+            keys = list(disk_keys)
+            disk_found = 0
+            now = time.time()
+
+            # sqlite limits the number of bound parameters per statement
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, compound, neg, neu, pos FROM scores WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+
+                for key, compound, neg, neu, pos in rows:
+                    scores = {"compound": compound, "neg": neg, "neu": neu, "pos": pos}
+                    found[disk_keys[key]] = scores
+                    self._remember(key, scores)
+
+                self._conn.executemany(
+                    "UPDATE scores SET last_used = ? WHERE key = ?",
+                    [(now, row[0]) for row in rows]
+                )
+                disk_found += len(rows)
+
+            self._conn.commit()
+            self.disk_hits += disk_found
+            self.misses += len(disk_keys) - disk_found
+
+        return found
+
+    def put_many(self, scored):
+
+        # scored maps text to its polarity_scores dict
+
+        now = time.time()
+        rows = []
+
+        with self._lock:
+            for text, scores in scored.items():
+                key = self.key(text)
+                self._remember(key, scores)
+                rows.append((key, scores["compound"], scores["neg"], scores["neu"], scores["pos"], now))
+
+            self._conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _remember(self, key, scores):
+        self._memory[key] = scores
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def _evict(self):
+        count = self._count()
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * EVICT_TO)
+            self._conn.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            count -= excess
+        self._entries = count
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": self._count(),
+            }
+
+    def close(self):
+        self._conn.close()
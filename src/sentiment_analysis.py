@@ -1,10 +1,14 @@
-import tkinter as tk
+import logging
+import os
+import threading
+import weakref
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
 import pandas as pd
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-import matplotlib.pyplot as plt
-
-nltk.download("vader_lexicon")
+from src import columnar, incremental, lexicon, metrics, vader_batch
+from src.score_cache import ScoreCache
 
 """
 Sentiment Analysis Module
@@ -22,6 +26,7 @@ Compound is from -1 to 1 and the neutral band is set at -0.05 - 0.05,
 which is quite small and easily changed
 
 label_sentiment method handles the labelling and modifying this method
+(and its vectorised twin label_sentiments, used on whole columns) 
 can add extra layers of sentiment for a more in depth look at how 
 stong sentiment is. Current app may show 70% positive and 30% negative, 
 however there may be no positive sentiment above 0.5 in those results and 
@@ -29,59 +34,452 @@ majority of the negative sentiment could be -0.9
 
 The resulting sentiment data is passed on to the visualisation module
 
-Note: commented out compute_weight method is part of fucntioanlity that
-looked to take sentiment from reddit comments and apply a weighting to 
-liked comments as oppose to downvoted comments. Reddit API limits prevented
-it from being integrated for now
+Large datasets can be scored across several processes by passing a
+workers count. Each worker builds its own SentimentIntensityAnalyzer once
+and reuses it for every chunk it is given, chunks are merged back in their
+original order so the output matches the single process path exactly
+
+Scores can also be looked up in a persistent ScoreCache (score_cache.py)
+so that only texts not seen before are scored, the cache is keyed on
+lexicon_version() so a change of lexicon never serves stale scores. The
+vectorized backend scores faster than the cache can look scores up, so
+default_cache_for_backend() only gives the cache to the backends in
+CACHED_BACKENDS
+
+analyze_csv_incremental only scores the rows appended to a CSV since it
+was last called and keeps running label counts alongside it (see
+incremental.py), so refreshing costs roughly the volume of new content
+
+Both analyze functions can also write their scores to a SentimentStore
+(storage.py) to keep a scored history in SQLite
+
+analyze_csv_streaming reads and scores a CSV chunk by chunk, appending
+each scored chunk to an output file and keeping only the label counts
+(and confusion counts against a manual label column) in memory, so files
+larger than memory can be scored and validated
+
+The thresholds are POSITIVE_THRESHOLD and NEGATIVE_THRESHOLD, and
+sentiment_percentages gives the positive, negative and neutral percentages
+of a labelled frame from a single value_counts pass
+
+Scored DataFrames can be compacted (compact=True or compact_scores) to
+hold sentiment and source as categoricals, the scores as float32 and an
+int8 sentiment_code (-1, 0, 1), which takes a fraction of the memory and
+gives the same label percentages and metrics. memory_report shows the
+deep memory use of each column, a compacted frame keeps its size before
+and after in df.attrs["memory"]
+
+The analyzer is built by get_analyzer() on first use rather than at
+import, nltk is slow to import and the GUI doesn't need it until the first
+analysis is run. Its lexicon is the compiled one from lexicon.py, VADER's
+lexicon with any overrides, loaded from a single binary file
+rather than parsed from nltk's text file in every process
+
+Texts are scored by SCORING_BACKEND, "vectorized" (the default) uses the
+BatchScorer in vader_batch.py, which gives the same scores as VADER's own
+polarity_scores for a whole column at once, "vader" calls polarity_scores
+for every text
+
+When Reddit comments are collected (data_collection comments=True),
+apply_weighting adds a weight per row from comment_weights, titles count
+for more than comments, deep replies for less, upvoted comments for more
+and downvoted ones for less. weighted_compound and the weighted
+sentiment_percentages then aggregate with those weights
 
 """
 
-sia = SentimentIntensityAnalyzer()
+SCORE_COLUMNS = ["compound", "neg", "neu", "pos"]
+
+PARALLEL_CHUNK_SIZE = 5000
+STREAM_CHUNK_SIZE = 50000
+
+# compound is rounded to 4 decimals, so -1 to 1 has 20,001 possible values
+COMPOUND_SCALE = 10000
+COMPOUND_BINS = 2 * COMPOUND_SCALE + 1
+
+SENTIMENT_CODES = {"Negative": -1, "Neutral": 0, "Positive": 1}
+
+SCORING_BACKENDS = ["vectorized", "vader"]
+SCORING_BACKEND = "vectorized"
+
+# backends the persistent score cache is used with by default
+CACHED_BACKENDS = ["vader"]
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+_sia = None
+_sia_lock = threading.Lock()
+
+_worker_sia = None
+_worker_backend = None
+
+_batch_scorers = weakref.WeakKeyDictionary()
+
+_default_cache = None
+_cache_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
 
 def label_sentiment(compound):
 
-    if compound >= 0.05:
+    if compound >= POSITIVE_THRESHOLD:
         return "Positive"
-    elif compound <= -0.05:
+    elif compound <= NEGATIVE_THRESHOLD:
         return "Negative"
     else:
         return "Neutral"
+
+def label_sentiments(compound, positive=None, negative=None):
     
-"""
+    # same rules as label_sentiment over a whole array of compound scores,
+    # the thresholds default to the module's current ones like it does
+    
+    positive = POSITIVE_THRESHOLD if positive is None else positive
+    negative = NEGATIVE_THRESHOLD if negative is None else negative
+    
+    compound = np.asarray(compound, dtype=float)
+    
+    return np.select(
+        [compound >= positive, compound <= negative],
+        ["Positive", "Negative"],
+        default="Neutral"
+    )
+
+def sentiment_percentages(df, weighted=False):
+    
+    # positive, negative, neutral percentages in the order DonutChart.update
+    # takes them, weighted=True sums the weight column instead of counting rows
     
-def compute_weight(row):
-    weight = 1.0
+    if weighted:
+        counts = df.groupby("sentiment", observed=True)["weight"].sum()
+    else:
+        counts = df["sentiment"].value_counts()
+    
+    return incremental.percentages_from_counts({
+        label: counts.get(label, 0) for label in incremental.SENTIMENT_LABELS
+    })
+    
+def comment_weights(df):
+    
+    # the rules of the original per-row compute_weight, a missing column
+    # (e.g. news has no level, depth or score) leaves the weight unchanged
+    
+    weight = np.ones(len(df))
+    
+    if "level" in df:
+        weight *= np.where(df["level"].to_numpy() == "title", 1.5, 1.0)
+    
+    if "depth" in df:
+        weight *= np.where(df["depth"].fillna(0).to_numpy() > 1, 0.5, 1.0)
+    
+    if "score" in df:
+        score = df["score"].fillna(0).to_numpy()
+        weight *= np.select([score > 50, score < 0], [1.3, 0.7], default=1.0)
+    
+    return weight
 
-    if row.get("level") == "title":
-        weight *= 1.5
+def weighted_compound(df):
+    
+    # the weight-averaged compound score of a weighted frame
+    
+    total = df["weight"].sum()
+    return float(df["weighted_compound"].sum() / total) if total else 0.0
 
-    depth = row.get("depth", 0)
-    if depth > 1:
-        weight *= 0.5
+def build_analyzer():
+    return lexicon.build_analyzer()
 
-    score = row.get("score", 0)
-    if score > 50:
-        weight *= 1.3
-    elif score < 0:
-        weight *= 0.7
+def get_analyzer():
+    global _sia
+    with _sia_lock:
+        if _sia is None:
+            _sia = build_analyzer()
+        return _sia
 
-    return weight
+def batch_scorer(analyzer=None):
     
-"""
+    # one BatchScorer per analyzer, it keeps the token ids it has seen
+    
+    analyzer = analyzer or get_analyzer()
+    with _sia_lock:
+        if analyzer not in _batch_scorers:
+            _batch_scorers[analyzer] = vader_batch.BatchScorer(analyzer)
+        return _batch_scorers[analyzer]
+
+def score_texts(texts, analyzer=None, backend=None):
+    
+    # each text is scored once and the four score columns are built from
+    # that single result, rather than calling polarity_scores per column
+    
+    backend = backend or SCORING_BACKEND
+    if backend not in SCORING_BACKENDS:
+        raise ValueError(f"Unknown scoring backend '{backend}', expected one of {', '.join(SCORING_BACKENDS)}")
+    
+    analyzer = analyzer or get_analyzer()
+    
+    if backend == "vectorized":
+        return batch_scorer(analyzer).score(texts)
+    
+    scores = [analyzer.polarity_scores(text) for text in texts]
+
+    return {
+        column: [score[column] for score in scores]
+        for column in SCORE_COLUMNS
+    }
+
+def score_texts_cached(texts, cache, workers=1):
+    
+    texts = list(texts)
+    found = cache.get_many(texts)
+    
+    # each new text is scored once even if it appears several times
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    
+    if missing:
+        if workers == 1:
+            scored = score_texts(missing)
+        else:
+            scored = score_texts_parallel(missing, workers)
+        
+        new_scores = {
+            text: {column: scored[column][i] for column in SCORE_COLUMNS}
+            for i, text in enumerate(missing)
+        }
+        cache.put_many(new_scores)
+        found.update(new_scores)
+    
+    return {
+        column: [found[text][column] for text in texts]
+        for column in SCORE_COLUMNS
+    }
+
+def lexicon_version():
+    compiled = lexicon.get_lexicon()
+    return f"nltk-{compiled['nltk']}-{compiled['digest'][:12]}"
 
-def analyze_csv_sentiment(csv_path):
+def default_cache():
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = ScoreCache(lexicon_version=lexicon_version())
+        return _default_cache
+
+def default_cache_for_backend(backend=None):
+    
+    # default_cache() if the backend is slower than a cache lookup, else None
+    
+    backend = backend or SCORING_BACKEND
+    return default_cache() if backend in CACHED_BACKENDS else None
+
+def _init_worker(backend):
+    global _worker_sia, _worker_backend
+    _worker_sia = build_analyzer()
+    _worker_backend = backend
+
+def _score_chunk(texts):
+    return score_texts(texts, _worker_sia, _worker_backend)
+
+def score_texts_parallel(texts, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    
+    texts = list(texts)
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1 or len(texts) <= chunk_size:
+        return score_texts(texts)
+    
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    
+    # the lexicon file is built here if needed, so the workers only load it
+    lexicon.get_lexicon()
+    
+    # map keeps results in submission order, so the merge needs no sorting
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(SCORING_BACKEND,)) as pool:
+        results = list(pool.map(_score_chunk, chunks))
+    
+    return {
+        column: [value for result in results for value in result[column]]
+        for column in SCORE_COLUMNS
+    }
+
+def analyze_dataframe_sentiment(df, workers=1, cache=None, apply_weighting=False):
+    
+    if cache is not None:
+        scores = score_texts_cached(df["text"], cache, workers)
+    elif workers == 1:
+        scores = score_texts(df["text"])
+    else:
+        scores = score_texts_parallel(df["text"], workers)
+    
+    for column, values in scores.items():
+        df[column] = values
+    
+    df["sentiment"] = label_sentiments(df["compound"])
+    
+    if apply_weighting:
+        df["weight"] = comment_weights(df)
+        df["weighted_compound"] = df["compound"] * df["weight"]
+
+    return df
+
+def compact_scores(df):
+    
+    # labels are categorical over the fixed label set so the codes and
+    # value_counts order are the same whichever labels a frame contains
+    
+    df["sentiment"] = pd.Categorical(df["sentiment"], categories=incremental.SENTIMENT_LABELS)
+    df["sentiment_code"] = df["sentiment"].map(SENTIMENT_CODES).astype("int8")
+    
+    if "source" in df:
+        df["source"] = df["source"].astype("category")
+    
+    for column in SCORE_COLUMNS:
+        df[column] = df[column].astype("float32")
+    
+    return df
+
+def memory_report(df):
+    
+    # bytes per column, counting the contents of string and object columns
+    
+    usage = df.memory_usage(deep=True, index=False)
+    report = {column: int(size) for column, size in usage.items()}
+    report["total"] = int(usage.sum())
+    return report
+
+def _compact(df):
+    
+    # the sizes go to the logger rather than stdout, which the CLI keeps for
+    # its summary, and are kept in df.attrs["memory"] for callers that want them
+    
+    before = memory_report(df)["total"]
+    df = compact_scores(df)
+    after = memory_report(df)["total"]
+    
+    df.attrs["memory"] = {"before": before, "after": after}
+    log.info("Compacted scores from %.2f MB to %.2f MB", before / 1e6, after / 1e6)
+    return df
+
+def analyze_csv_sentiment(csv_path, workers=1, cache=None, store=None, columns=None, compact=False, apply_weighting=False):
+    
+    # csv_path can also be a .parquet or .arrow file (see columnar.py),
+    # columns limits which columns are read, it must include text
+    
+    df = columnar.read_table(csv_path, columns)
+    
+    df = analyze_dataframe_sentiment(df, workers, cache, apply_weighting)
+    
+    if store is not None:
+        store.add_scores(Path(csv_path).stem, df)
+    
+    if compact:
+        df = _compact(df)
+    
+    return df
+
+def analyze_csv_incremental(csv_path, workers=1, cache=None, store=None, compact=False):
+    
+    # scores only the rows appended since the last call and adds their
+    # labels to the running counts kept next to the csv
+    
+    state = incremental.load_state(csv_path)
     
-    df = pd.read_csv(csv_path)
+    if columnar.file_format(csv_path) != "csv":
+        df = columnar.read_table(csv_path).iloc[state["scored_rows"]:]
+    else:
+        try:
+            df = pd.read_csv(csv_path, skiprows=range(1, state["scored_rows"] + 1))
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame(), state["counts"]
+    
+    if not df.empty:
+        df = analyze_dataframe_sentiment(df, workers, cache)
+        
+        for label, count in df["sentiment"].value_counts().items():
+            state["counts"][label] += int(count)
+        state["scored_rows"] += len(df)
+        
+        incremental.save_state(csv_path, state)
+        
+        if store is not None:
+            store.add_scores(Path(csv_path).stem, df)
+        
+        if compact:
+            df = _compact(df)
+    
+    return df, state["counts"]
+
+def compound_histogram(compound, actual, size=len(metrics.LABELS) + 1):
     
-    df["compound"] = df["text"].apply(lambda x: sia.polarity_scores(x)["compound"])
-    df["neg"] = df["text"].apply(lambda x: sia.polarity_scores(x)["neg"])
-    df["neu"] = df["text"].apply(lambda x: sia.polarity_scores(x)["neu"])
-    df["pos"] = df["text"].apply(lambda x: sia.polarity_scores(x)["pos"])
+    # (size, COMPOUND_BINS) counts of compound scores per manual label code
+    # (see metrics.encode). VADER rounds compound to 4 decimals, so bin i
+    # holds exactly the scores equal to compound_values()[i] and the counts
+    # lose nothing a threshold sweep needs, in constant memory
+    
+    bins = np.rint((np.asarray(compound, dtype=float) + 1) * COMPOUND_SCALE).astype(np.intp)
+    bins = np.clip(bins, 0, COMPOUND_BINS - 1)
+    
+    pairs = np.asarray(actual, dtype=np.intp) * COMPOUND_BINS + bins
+    return np.bincount(pairs, minlength=size * COMPOUND_BINS).reshape(size, COMPOUND_BINS)
+
+def compound_values():
     
-    df["sentiment"] = df["compound"].apply(label_sentiment)
+    # the compound score of each histogram bin, the same floats VADER's
+    # round(compound, 4) gives
     
-    # if apply_weighting:
-        # df["weight"] = df.apply(compute_weight, axis=1)
-        # df["weighted_compound"] = df["compound"] * df["weight"]
+    return (np.arange(COMPOUND_BINS) - COMPOUND_SCALE) / COMPOUND_SCALE
 
-    return df
\ No newline at end of file
+def analyze_csv_streaming(csv_path, output_path=None, workers=1, cache=None, chunksize=STREAM_CHUNK_SIZE,
+                          label_column="manual_sentiment", cancel_event=None, progress=None, histogram=False):
+    
+    # only one chunk is held at a time, the scored chunks are appended to
+    # output_path (if given) and just the counts are kept. confusion maps
+    # (manual label, predicted label) pairs to counts and is None when the
+    # csv has no label_column. Returns None if cancel_event is set part way
+    
+    # histogram also returns compound_histogram counts of the labelled
+    # rows, added up chunk by chunk, for threshold sweeps
+    
+    counts = {label: 0 for label in incremental.SENTIMENT_LABELS}
+    confusion = Counter()
+    labelled = False
+    rows = 0
+    compound_counts = None
+    
+    with pd.read_csv(csv_path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            
+            chunk = analyze_dataframe_sentiment(chunk, workers, cache)
+            
+            for label, count in chunk["sentiment"].value_counts().items():
+                counts[label] += int(count)
+            
+            if label_column in chunk:
+                labelled = True
+                actual = chunk[label_column].fillna("").astype(str)
+                for pair, count in chunk.groupby([actual, chunk["sentiment"]]).size().items():
+                    confusion[pair] += int(count)
+            
+            if histogram and label_column in chunk:
+                chunk_counts = compound_histogram(chunk["compound"], metrics.encode(chunk[label_column]))
+                compound_counts = chunk_counts if compound_counts is None else compound_counts + chunk_counts
+            
+            if output_path is not None:
+                chunk.to_csv(output_path, mode="a" if rows else "w", header=not rows, index=False, encoding="utf-8")
+            
+            rows += len(chunk)
+            
+            if progress:
+                progress(rows)
+    
+    result = {
+        "rows": rows,
+        "counts": counts,
+        "confusion": dict(confusion) if labelled else None,
+    }
+    
+    if histogram:
+        result["histogram"] = compound_counts
+    
+    return result
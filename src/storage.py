@@ -0,0 +1,204 @@
+import sqlite3
+import threading
+from pathlib import Path
+import pandas as pd
+
+"""
+Storage Module
+
+Optional SQLite storage for collected posts and their sentiment scores
+
+The CSV files in the data folder are overwritten on every run, so on their
+own they hold no history. When a SentimentStore is passed to the data
+collection and sentiment analysis functions every collected item and its
+scores are also kept here, building up a history across runs
+
+Tables:
+
+- sources - one row per subreddit / news publisher
+- items   - one row per collected title, unique per dataset, source, date
+            and text so collecting the same post twice doesn't duplicate it
+- scores  - the VADER scores and label for an item
+
+Each dataset is named after the CSV it belongs to (mu_posts,
+general_articles, ...). The scored_items view joins the three tables back
+into the same columns as the CSV files, which export_csv writes out
+
+The per-source and per-day aggregates the GUI needs are computed in SQL,
+so nothing has to load and parse the full history to draw a chart
+
+The database runs in WAL mode so the GUI can read while a collection is
+writing
+
+"""
+
+STORE_FILE = "data/sentiment.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    date TEXT NOT NULL,
+    text TEXT NOT NULL,
+    collected_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (dataset, source_id, date, text)
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+    item_id INTEGER PRIMARY KEY REFERENCES items(id),
+    compound REAL NOT NULL,
+    neg REAL NOT NULL,
+    neu REAL NOT NULL,
+    pos REAL NOT NULL,
+    sentiment TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS items_dataset_date ON items(dataset, date);
+CREATE INDEX IF NOT EXISTS items_source ON items(source_id);
+CREATE INDEX IF NOT EXISTS scores_sentiment ON scores(sentiment);
+
+CREATE VIEW IF NOT EXISTS scored_items AS
+SELECT items.dataset, items.date, items.text, sources.name AS source,
+       scores.compound, scores.neg, scores.neu, scores.pos, scores.sentiment
+FROM items
+JOIN sources ON sources.id = items.source_id
+LEFT JOIN scores ON scores.item_id = items.id;
+"""
+
+LABEL_COUNTS = """
+COUNT(scores.item_id) AS total,
+SUM(scores.sentiment = 'Positive') AS positive,
+SUM(scores.sentiment = 'Negative') AS negative,
+SUM(scores.sentiment = 'Neutral') AS neutral,
+AVG(scores.compound) AS mean_compound
+"""
+
+class SentimentStore:
+    def __init__(self, path=STORE_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add_items(self, dataset, df):
+
+        # returns how many of the rows were new
+
+        rows = _item_rows(dataset, df)
+
+        with self._lock:
+            inserted = self._insert_items(rows)
+            self._conn.commit()
+            return inserted
+
+    def add_scores(self, dataset, df):
+
+        # items are inserted first in case they were collected without the
+        # store, then each score row is matched back to its item
+
+        rows = _item_rows(dataset, df)
+        score_rows = [
+            (compound, neg, neu, pos, sentiment) + row
+            for row, compound, neg, neu, pos, sentiment in zip(
+                rows, df["compound"], df["neg"], df["neu"], df["pos"], df["sentiment"]
+            )
+        ]
+
+        with self._lock:
+            self._insert_items(rows)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO scores (item_id, compound, neg, neu, pos, sentiment) "
+                "SELECT items.id, ?, ?, ?, ?, ? FROM items "
+                "JOIN sources ON sources.id = items.source_id "
+                "WHERE items.dataset = ? AND sources.name = ? AND items.date = ? AND items.text = ?",
+                score_rows
+            )
+            self._conn.commit()
+
+    def _insert_items(self, rows):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO sources (name) VALUES (?)",
+            {(row[1],) for row in rows}
+        )
+        before = self._conn.total_changes
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO items (dataset, source_id, date, text) "
+            "SELECT ?, id, ?, ? FROM sources WHERE name = ?",
+            [(dataset, date, text, source) for dataset, source, date, text in rows]
+        )
+        return self._conn.total_changes - before
+
+    def source_aggregates(self, dataset, since=None):
+        return self._query(
+            f"SELECT sources.name AS source, {LABEL_COUNTS} "
+            "FROM items JOIN sources ON sources.id = items.source_id "
+            "JOIN scores ON scores.item_id = items.id "
+            "WHERE items.dataset = ? AND items.date >= ? "
+            "GROUP BY sources.name ORDER BY total DESC",
+            (dataset, since or "")
+        )
+
+    def daily_aggregates(self, dataset, since=None):
+        return self._query(
+            f"SELECT items.date AS date, {LABEL_COUNTS} "
+            "FROM items JOIN scores ON scores.item_id = items.id "
+            "WHERE items.dataset = ? AND items.date >= ? "
+            "GROUP BY items.date ORDER BY items.date",
+            (dataset, since or "")
+        )
+
+    def sentiment_percentages(self, dataset, since=None):
+
+        # positive, negative, neutral percentages in the order DonutChart.update takes them
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 100.0 * AVG(scores.sentiment = 'Positive'), "
+                "100.0 * AVG(scores.sentiment = 'Negative'), "
+                "100.0 * AVG(scores.sentiment = 'Neutral') "
+                "FROM items JOIN scores ON scores.item_id = items.id "
+                "WHERE items.dataset = ? AND items.date >= ?",
+                (dataset, since or "")
+            ).fetchone()
+
+        return tuple(value or 0 for value in row)
+
+    def export_csv(self, dataset, csv_path, scored=False):
+        columns = "date, text, source"
+        if scored:
+            columns += ", compound, neg, neu, pos, sentiment"
+
+        df = self._query(
+            f"SELECT {columns} FROM scored_items WHERE dataset = ? ORDER BY date, source",
+            (dataset,)
+        )
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+        return df
+
+    def _query(self, sql, params):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def close(self):
+        self._conn.close()
+
+def _item_rows(dataset, df):
+    n = len(df)
+    dates = df["date"] if "date" in df else [""] * n
+    sources = df["source"] if "source" in df else ["unknown"] * n
+
+    return [
+        (dataset, str(source), str(date), str(text))
+        for date, text, source in zip(dates, df["text"], sources)
+    ]
@@ -0,0 +1,240 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from pathlib import Path
+import pandas as pd
+from src import columnar, data_collection, http_client, incremental, sentiment_analysis
+from src.pipeline import ANALYSES
+
+"""
+Streaming Pipeline Module
+
+Runs an analysis as a stream rather than in two phases. The two phase
+flow in pipeline.py collects every post, writes the CSV, reads it back and
+only then starts scoring, so nothing is known until the slowest feed has
+arrived. Here:
+
+- fetch - producer threads page through the subreddits / download the
+  feeds (feeds in the order they finish) and put each cleaned, keyword
+  filtered row on a queue as soon as it exists, using the same generator
+  stages as data_collection (iter_subreddit_posts, reddit_rows, news_rows)
+- score - the calling thread takes rows off the queue in batches of
+  BATCH_SIZE, scores and labels them and adds them to the running counts.
+  A part filled batch is scored anyway after BATCH_WAIT seconds without a
+  new row, so the first results don't wait for a full batch
+- sink - each scored batch can also go to a TableWriter (CSV, Parquet or
+  Arrow, see columnar.py) and a SentimentStore
+
+The queue holds at most QUEUE_SIZE rows, a fetcher that gets ahead of the
+scorer waits on put() until there is room, so memory stays bounded by the
+queue and one batch rather than the whole collection. If scoring fails or
+the run is cancelled the fetchers are told to stop, the queue is drained
+until they have and the sink is closed
+
+on_batch is called with the running summary after every batch, which is
+where a GUI or CLI can show results while collection is still going. The
+summary at the end matches run_pipeline's, with first_result (seconds
+until the first batch was scored) in its timings
+
+Incremental collection, Reddit comments and collapsing near duplicate
+news stories (dedup.py) are only supported by the two phase flow. A
+story's cluster isn't known until every feed has arrived (a later
+headline can join two clusters that were already scored), so a news
+analysis is refused unless it's asked for with collapse_duplicates=False,
+which then matches fetch_news_rss(collapse_duplicates=False)
+
+"""
+
+QUEUE_SIZE = 1000
+BATCH_SIZE = 100
+BATCH_WAIT = 0.2
+
+REDDIT_LIMIT = 100
+NEWS_LIMIT_PER_FEED = 50
+
+PUT_WAIT = 0.1
+
+_DONE = object()
+
+class _Stopped(Exception):
+    pass
+
+def produce_reddit(analysis, client, cancel_event, emit, limit=REDDIT_LIMIT):
+    subreddits = data_collection.subreddits_for(analysis["type"])
+
+    def run(subreddit):
+        posts = data_collection.iter_subreddit_posts(
+            client, data_collection.REDDIT_URL_TEMPLATE, subreddit, cancel_event=cancel_event
+        )
+        for _, row in islice(data_collection.reddit_rows(posts, subreddit, analysis["mu_only"]), limit):
+            emit(row)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(data_collection.MAX_FETCH_WORKERS, len(subreddits)))) as pool:
+        list(pool.map(run, subreddits))
+
+def produce_news(analysis, client, cancel_event, emit, limit_per_feed=NEWS_LIMIT_PER_FEED):
+    feeds = data_collection.feeds_for(analysis["type"])
+    feed_cache = data_collection.load_feed_cache()
+    fetched = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(data_collection.MAX_FEED_WORKERS, len(feeds)))) as pool:
+        futures = {
+            pool.submit(data_collection.fetch_feed, client, feed_url, feed_cache.get(feed_url)): feed_url
+            for feed_url in feeds
+        }
+
+        for future in as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                return
+
+            cached, info = future.result()
+            if cached is None:
+                print(f"\nFeed: {futures[future]} -> failed ({info['status']})")
+                continue
+
+            fetched[futures[future]] = cached
+
+            for row in data_collection.news_rows(cached["entries"][:limit_per_feed], cached["source"], analysis["mu_only"]):
+                emit(row)
+
+    data_collection.save_feed_cache(fetched)
+
+def run_streaming(name, workers=1, cache=None, store=None, output_path=None, cancel_event=None,
+                  on_batch=None, client=None, batch_size=BATCH_SIZE, collapse_duplicates=True):
+
+    # returns the same summary as pipeline.run_pipeline, or None if
+    # cancel_event was set part way through
+
+    analysis = ANALYSES[name]
+
+    if analysis["collector"] == "news" and collapse_duplicates:
+        raise ValueError(
+            f"{name} collapses near duplicate stories, which needs every feed first, "
+            "run it with pipeline.run_pipeline or pass collapse_duplicates=False"
+        )
+
+    client = client or http_client.default_client()
+    produce = produce_reddit if analysis["collector"] == "reddit" else produce_news
+
+    start = time.perf_counter()
+    rows = queue.Queue(maxsize=QUEUE_SIZE)
+    errors = []
+    stop = threading.Event()
+
+    def emit(row):
+
+        # a full queue is retried until the consumer takes a row or stops
+        # reading, so the fetch threads never block forever
+
+        while True:
+            if stop.is_set():
+                raise _Stopped()
+            try:
+                rows.put(row, timeout=PUT_WAIT)
+                return
+            except queue.Full:
+                pass
+
+    def producer():
+        try:
+            produce(analysis, client, cancel_event, emit)
+        except _Stopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+        finally:
+            rows.put(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+
+    sink = columnar.TableWriter(output_path) if output_path else None
+    dataset = Path(analysis["csv"]).stem
+
+    counts = {label: 0 for label in incremental.SENTIMENT_LABELS}
+    source_counts = {}
+    if analysis["collector"] == "reddit":
+        source_counts = {f"r/{subreddit}": 0 for subreddit in data_collection.subreddits_for(analysis["type"])}
+
+    timings = {}
+    total = 0
+    batch = []
+    done = False
+
+    def summary():
+        pos_percent, neg_percent, neu_percent = incremental.percentages_from_counts(counts)
+        return {
+            "analysis": name,
+            "total": total,
+            "sources": dict(source_counts),
+            "percentages": {
+                "positive": float(pos_percent),
+                "negative": float(neg_percent),
+                "neutral": float(neu_percent),
+            },
+            "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        }
+
+    # whatever happens in the loop the producer is stopped and joined and the
+    # sink closed, so no fetch thread is left blocked on a full queue and a
+    # Parquet / Arrow sink always gets its footer
+    try:
+        while not done:
+            try:
+                row = rows.get(timeout=BATCH_WAIT)
+            except queue.Empty:
+                row = None
+
+            if row is _DONE:
+                done = True
+            elif row is not None:
+                batch.append(row)
+
+            # score when the batch is full, when rows stop arriving for a moment, or at the end
+            if not batch or not (done or row is None or len(batch) >= batch_size):
+                continue
+
+            if cancel_event is not None and cancel_event.is_set():
+                batch = []
+                continue
+
+            df = sentiment_analysis.analyze_dataframe_sentiment(pd.DataFrame(batch), workers, cache)
+            batch = []
+
+            for label, count in df["sentiment"].value_counts().items():
+                counts[label] += int(count)
+            for source, count in df["source"].value_counts().items():
+                source_counts[source] = source_counts.get(source, 0) + int(count)
+            total += len(df)
+
+            if sink is not None:
+                sink.write(df)
+            if store is not None:
+                store.add_scores(dataset, df)
+
+            if "first_result" not in timings:
+                timings["first_result"] = time.perf_counter() - start
+
+            if on_batch:
+                on_batch(summary())
+    finally:
+        stop.set()
+        while not done:
+            done = rows.get() is _DONE
+        thread.join()
+
+        if sink is not None:
+            sink.close()
+
+    if errors:
+        raise errors[0]
+
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+
+    timings["stream"] = time.perf_counter() - start
+    return summary()
@@ -0,0 +1,326 @@
+import string
+import threading
+import numpy as np
+
+"""
+VADER Batch Scoring Module
+
+Scores a whole column of texts with the same results as NLTK's
+SentimentIntensityAnalyzer.polarity_scores, without running VADER's per
+word Python logic for every text
+
+polarity_scores is called once per text and does its rule checks word by
+word, for short titles that per call overhead is most of the cost. Here:
+
+- each text is split into tokens the same way SentiText does it (once per
+  distinct word, not per text), and every distinct token is given an
+  integer id the first time it is seen. What VADER needs to know about a
+  token (lexicon valence, booster value, ALL CAPS, negation word, "never" /
+  "so" / "this", "kind" / "of", "but") is worked out once per id and kept
+  in numpy arrays indexed by id
+- a batch of texts becomes one padded (texts x tokens) matrix of ids, and
+  the caps, booster, negation, "kind of" and "but" rules are applied to
+  whole columns of that matrix at once, looking back at the previous three
+  columns the way sentiment_valence looks back at the previous three words
+- the sums, the punctuation emphasis and the normalisation are done with
+  the same floating point operations in the same order as score_valence
+  (the sums are accumulated column by column, left to right, rather than
+  with numpy's pairwise sum), so the scores are the same to the last bit
+  and round the same way
+
+Texts are batched by length so the padding stays small
+
+A few rules are rare in headlines and awkward to express on whole columns,
+texts that could trigger them are scored by the analyzer itself instead:
+
+- "least" anywhere in the text (_least_check)
+- two adjacent words from one of VADER's idioms or two word boosters,
+  e.g. "yeah right" or "kind of" (_idioms_check)
+- anything that isn't a string
+
+The lexicon and rules are taken from the analyzer the scorer is built
+from, so a modified lexicon is scored with that lexicon
+
+"""
+
+BATCH_SIZE = 4096
+
+_PUNCTUATION = frozenset(string.punctuation)
+_FIELDS = {
+    "valence": float,
+    "booster": float,
+    "is_booster": bool,
+    "upper": bool,
+    "negated": bool,
+    "never": bool,
+    "so_this": bool,
+    "kind": bool,
+    "of": bool,
+    "but": bool,
+    "least": bool,
+    "phrase": np.intp,
+}
+
+def _strip_punctuation(token, punc_list):
+
+    # SentiText takes one of punc_list off the front or back of a word
+
+    start = 0
+    while start < len(token) and token[start] in _PUNCTUATION:
+        start += 1
+
+    if start == len(token):
+        return token
+
+    if start:
+        punctuation, word = token[:start], token[start:]
+    else:
+        end = len(token)
+        while token[end - 1] in _PUNCTUATION:
+            end -= 1
+        word, punctuation = token[:end], token[end:]
+
+    # the word left over must be one SentiText would have kept on its own,
+    # more than one character and no punctuation inside it
+    if punctuation in punc_list and len(word) > 1 and not any(c in _PUNCTUATION for c in word):
+        return word
+    return token
+
+class BatchScorer:
+    def __init__(self, analyzer, batch_size=BATCH_SIZE):
+        self.analyzer = analyzer
+        self.lexicon = analyzer.lexicon
+        self.constants = analyzer.constants
+        self.batch_size = batch_size
+
+        self.punc_list = frozenset(self.constants.PUNC_LIST)
+
+        # adjacent word pairs that any idiom or two word booster needs
+        phrases = list(self.constants.SPECIAL_CASE_IDIOMS) + [b for b in self.constants.BOOSTER_DICT if " " in b]
+        words = sorted({word for phrase in phrases for word in phrase.split()})
+        self._phrase_words = {word: i + 1 for i, word in enumerate(words)}
+        self._phrase_pairs = np.array(sorted({
+            self._phrase_words[a] * (len(words) + 1) + self._phrase_words[b]
+            for phrase in phrases
+            for a, b in zip(phrase.split(), phrase.split()[1:])
+        }))
+
+        self._ids = {}
+        self._words = {}
+        self._arrays = {}
+        self._lock = threading.Lock()
+
+        # id 0 is the padding, an empty token that no rule applies to
+        self._token_id("")
+
+    def score(self, texts):
+
+        # the same columns as sentiment_analysis.score_texts, in order
+
+        texts = list(texts)
+        results = {column: np.zeros(len(texts)) for column in ("compound", "neg", "neu", "pos")}
+
+        with self._lock:
+            docs, fallback = self._tokenize(texts)
+
+            docs.sort(key=lambda doc: len(doc[1]))
+            for start in range(0, len(docs), self.batch_size):
+                batch = docs[start:start + self.batch_size]
+                fallback.extend(self._score_batch(batch, texts, results))
+
+        for index in fallback:
+            for column, value in self.analyzer.polarity_scores(texts[index]).items():
+                results[column][index] = value
+
+        return {column: values.tolist() for column, values in results.items()}
+
+    def _tokenize(self, texts):
+
+        # token ids are looked up by the whitespace separated word before
+        # any punctuation is taken off, taking it off only depends on the
+        # word itself so it's done once per distinct word
+
+        docs, fallback = [], []
+        words = self._words
+
+        for index, text in enumerate(texts):
+            if not isinstance(text, str):
+                fallback.append(index)
+                continue
+
+            docs.append((index, [words[w] if w in words else self._word_id(w) for w in text.split() if len(w) > 1]))
+
+        return docs, fallback
+
+    def _word_id(self, word):
+        token = word
+        if word[0] in _PUNCTUATION or word[-1] in _PUNCTUATION:
+            token = _strip_punctuation(word, self.punc_list)
+
+        token_id = self._ids[token] if token in self._ids else self._token_id(token)
+        self._words[word] = token_id
+        return token_id
+
+    def _token_id(self, token):
+        token_id = len(self._ids)
+        self._ids[token] = token_id
+
+        size = len(next(iter(self._arrays.values()))) if self._arrays else 0
+        if token_id >= size:
+            grown = max(1024, size * 2)
+            for field, dtype in _FIELDS.items():
+                array = self._arrays.get(field)
+                new = np.zeros(grown, dtype=dtype)
+                if array is not None:
+                    new[:size] = array
+                self._arrays[field] = new
+
+        lower = token.lower()
+        a = self._arrays
+        a["valence"][token_id] = self.lexicon.get(lower, np.nan) if lower else np.nan
+        a["booster"][token_id] = self.constants.BOOSTER_DICT.get(lower, 0.0)
+        a["is_booster"][token_id] = lower in self.constants.BOOSTER_DICT
+        a["upper"][token_id] = token.isupper()
+        a["negated"][token_id] = bool(lower) and (lower in self.constants.NEGATE or "n't" in lower)
+        a["never"][token_id] = token == "never"
+        a["so_this"][token_id] = token in ("so", "this")
+        a["kind"][token_id] = lower == "kind"
+        a["of"][token_id] = lower == "of"
+        a["but"][token_id] = lower == "but"
+        a["least"][token_id] = lower == "least"
+        a["phrase"][token_id] = self._phrase_words.get(token, 0)
+
+        return token_id
+
+    def _score_batch(self, batch, texts, results):
+
+        # scores one batch of (index, token ids) into results, returning the
+        # indexes that need the analyzer instead
+
+        a = self._arrays
+        c = self.constants
+
+        lengths = np.array([len(token_ids) for _, token_ids in batch])
+        width = int(lengths.max()) if len(batch) else 0
+        if width == 0:
+            return []
+
+        position = np.arange(width)
+        valid = position < lengths[:, None]
+
+        ids = np.zeros((len(batch), width), dtype=np.intp)
+        ids[valid] = [token_id for _, token_ids in batch for token_id in token_ids]
+
+        def previous(k):
+            shifted = np.zeros_like(ids)
+            shifted[:, k:] = ids[:, :-k]
+            return shifted
+
+        # rare rules, left to the analyzer
+        phrase = a["phrase"][ids]
+        pairs = phrase[:, :-1] * (len(self._phrase_words) + 1) + phrase[:, 1:]
+        rare = a["least"][ids].any(axis=1) | np.isin(pairs, self._phrase_pairs).any(axis=1)
+
+        # ALL CAPS only counts when some but not all tokens are
+        upper_count = (a["upper"][ids] & valid).sum(axis=1)
+        cap_diff = ((upper_count > 0) & (upper_count < lengths))[:, None]
+
+        valence = a["valence"][ids]
+        in_lexicon = ~np.isnan(valence)
+        v = np.where(in_lexicon, valence, 0.0)
+        v = np.where(in_lexicon & a["upper"][ids] & cap_diff, np.where(v > 0, v + c.C_INCR, v - c.C_INCR), v)
+
+        back = [previous(k) for k in (1, 2, 3)]
+
+        for start_i in range(3):
+            word = back[start_i]
+            applies = in_lexicon & (position > start_i) & np.isnan(a["valence"][word])
+
+            # scalar_inc_dec, against the valence so far
+            s = np.where(v < 0, a["booster"][word] * -1, a["booster"][word])
+            s = np.where(a["is_booster"][word] & a["upper"][word] & cap_diff, np.where(v > 0, s + c.C_INCR, s - c.C_INCR), s)
+            if start_i == 1:
+                s = s * 0.95
+            if start_i == 2:
+                s = s * 0.9
+            v = np.where(applies, v + s, v)
+
+            # _never_check
+            if start_i == 0:
+                v = np.where(applies & a["negated"][back[0]], v * c.N_SCALAR, v)
+            elif start_i == 1:
+                never_so = a["never"][back[1]] & a["so_this"][back[0]]
+                v = np.where(applies & never_so, v * 1.5, np.where(applies & a["negated"][back[1]], v * c.N_SCALAR, v))
+            else:
+                never_so = (a["never"][back[2]] & a["so_this"][back[1]]) | a["so_this"][back[0]]
+                v = np.where(applies & never_so, v * 1.25, np.where(applies & a["negated"][back[2]], v * c.N_SCALAR, v))
+
+        # boosters and "kind" before "of" score 0 whether or not they're in the lexicon
+        following = np.zeros_like(ids)
+        following[:, :-1] = ids[:, 1:]
+        zero = ~in_lexicon | a["is_booster"][ids] | (a["kind"][ids] & a["of"][following])
+        sentiments = np.where(zero, 0.0, v)
+
+        # a repeated token takes the score of its first occurrence, as
+        # polarity_scores looks every token up by its first index
+        keys = (np.arange(len(batch))[:, None] * len(self._ids) + ids).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        sentiments = sentiments.ravel()[first[inverse.ravel()]].reshape(ids.shape)
+        sentiments[~valid] = 0.0
+
+        # _but_check, halve what comes before the first "but" and add half to what follows
+        but = a["but"][ids]
+        has_but = but.any(axis=1)[:, None]
+        but_index = but.argmax(axis=1)[:, None]
+        factor = np.where(position < but_index, 0.5, np.where(position > but_index, 1.5, 1.0))
+        sentiments = np.where(has_but, sentiments * factor, sentiments)
+
+        # score_valence, summed left to right like the Python loop
+        sum_s = np.zeros(len(batch))
+        pos_sum = np.zeros(len(batch))
+        neg_sum = np.zeros(len(batch))
+        for column in sentiments.T:
+            sum_s = sum_s + column
+            pos_sum = pos_sum + np.where(column > 0, column + 1, 0.0)
+            neg_sum = neg_sum + np.where(column < 0, column - 1, 0.0)
+        neu_count = ((sentiments == 0) & valid).sum(axis=1)
+
+        amplifier = _punctuation_emphasis([texts[index] for index, _ in batch])
+        sum_s = np.where(sum_s > 0, sum_s + amplifier, np.where(sum_s < 0, sum_s - amplifier, sum_s))
+        compound = sum_s / np.sqrt(sum_s * sum_s + 15)
+
+        negative_size = np.abs(neg_sum)
+        pos_sum, neg_sum = (
+            np.where(pos_sum > negative_size, pos_sum + amplifier, pos_sum),
+            np.where(pos_sum < negative_size, neg_sum - amplifier, neg_sum),
+        )
+
+        total = pos_sum + np.abs(neg_sum) + neu_count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = {
+                "neg": np.abs(neg_sum / total),
+                "neu": np.abs(neu_count / total),
+                "pos": np.abs(pos_sum / total),
+                "compound": compound,
+            }
+
+        # texts without tokens keep their 0 scores
+        indexes = np.array([index for index, _ in batch])
+        keep = ~rare & (lengths > 0)
+        for column, values in scores.items():
+            digits = 4 if column == "compound" else 3
+            results[column][indexes[keep]] = [round(value, digits) for value in values[keep].tolist()]
+
+        return indexes[rare].tolist()
+
+def _punctuation_emphasis(texts):
+
+    # SentimentIntensityAnalyzer._amplify_ep + _amplify_qm for each text
+
+    ep_count = np.fromiter((text.count("!") for text in texts), dtype=np.int64, count=len(texts))
+    qm_count = np.fromiter((text.count("?") for text in texts), dtype=np.int64, count=len(texts))
+
+    ep_amplifier = np.minimum(ep_count, 4) * 0.292
+    qm_amplifier = np.where(qm_count > 1, np.where(qm_count <= 3, qm_count * 0.18, 0.96), 0.0)
+
+    return ep_amplifier + qm_amplifier
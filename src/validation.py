@@ -1,8 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-from src import sentiment_analysis, donut_chart, styles
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix
+import numpy as np
+from src import sentiment_analysis, donut_chart, incremental, jobs, metrics, styles
 
 """
     Evaluation module 
@@ -28,10 +28,25 @@ from sklearn.metrics import accuracy_score, precision_recall_fscore_support, con
 
     The window uses grab_set, preventing interaction with the parent window
     until closed, as an error prevention plan
+
+    The CSV is scored in chunks on a background job (see
+    sentiment_analysis.analyze_csv_streaming) so memory stays flat however
+    large the file is. Only the label counts and the (manual, predicted)
+    confusion counts are kept, and every metric (with a bootstrap confidence
+    interval for accuracy) is worked out from those by metrics.py
+
+    The run also sweeps the neutral band: threshold_sweep scores every
+    (negative, positive) threshold pair on a grid from a per label
+    histogram of the compound scores of the one run, without re-labelling
+    or keeping any rows, and the window shows the pair with the best macro
+    F1. The full grid it returns can be plotted as a heatmap
     
 
 """
 
+NEGATIVE_GRID = np.round(np.arange(-0.5, 0.0001, 0.005), 3)
+POSITIVE_GRID = np.round(np.arange(0, 0.5001, 0.005), 3)
+
 def open_test_window(parent):
     
     test_win = tk.Toplevel(parent)
@@ -43,7 +58,10 @@ def open_test_window(parent):
 
     styles.apply_styles(test_win)
     
+    job_runner = jobs.JobRunner(test_win)
+
     def on_close():
+        job_runner.shutdown()
         test_win.destroy()
 
     test_win.protocol("WM_DELETE_WINDOW", on_close)
@@ -76,61 +94,93 @@ def open_test_window(parent):
             messagebox.showwarning("No file", "Please select a CSV file first.")
             return
 
-        try:
-            df = sentiment_analysis.analyze_csv_sentiment(path)
-
-            pos_percent = (df["sentiment"] == "Positive").mean() * 100
-            neg_percent = (df["sentiment"] == "Negative").mean() * 100
-            neu_percent = (df["sentiment"] == "Neutral").mean() * 100
-            test_donut.update(pos_percent, neg_percent, neu_percent)
-
-            if "manual_sentiment" in df.columns:
-                y_true = df["manual_sentiment"]
-                y_pred = df["sentiment"]
-
-                total_var.set(str(len(df)))
-                correct_var.set(str((y_true == y_pred).sum()))
-                accuracy_var.set(f"{accuracy_score(y_true, y_pred)*100:.1f}%")
-
-                precision, recall, f1, _ = precision_recall_fscore_support(
-                    y_true, y_pred,
-                    labels=["Positive", "Negative", "Neutral"],
-                    average=None,
-                    zero_division=0
-                )
-
-                precision_pos_var.set(f"{precision[0]*100:.1f}%")
-                precision_neg_var.set(f"{precision[1]*100:.1f}%")
-                precision_neu_var.set(f"{precision[2]*100:.1f}%")
-
-                recall_pos_var.set(f"{recall[0]*100:.1f}%")
-                recall_neg_var.set(f"{recall[1]*100:.1f}%")
-                recall_neu_var.set(f"{recall[2]*100:.1f}%")
-
-                f1_pos_var.set(f"{f1[0]*100:.1f}%")
-                f1_neg_var.set(f"{f1[1]*100:.1f}%")
-                f1_neu_var.set(f"{f1[2]*100:.1f}%")
-
-                cm = confusion_matrix(y_true, y_pred, labels=["Positive", "Neutral", "Negative"])
-                for i in range(3):
-                    for j in range(3):
-                        cm_vars[i][j].set(str(cm[i, j]))
-
-            else:
-                messagebox.showinfo(
-                    "Info",
-                    "Analysis complete.\nNo manual labels found for validation."
-                )
-
-        except Exception as e:
+        if job_runner.is_running("validation"):
+            job_runner.cancel("validation")
+            run_button.config(text="Cancelling...")
+            return
+
+        def work(job):
+            result = sentiment_analysis.analyze_csv_streaming(
+                path,
+                cancel_event=job.cancel_event,
+                progress=lambda rows: job.progress(f"Scored {rows:,} rows (click to cancel)"),
+                histogram=True
+            )
+            if result is not None and result["histogram"] is not None:
+                result["sweep"] = threshold_sweep(result["histogram"])
+            return result
+
+        def on_done(result):
+            run_button.config(text=run_label)
+            show_results(result)
+
+        def on_error(e):
+            run_button.config(text=run_label)
             messagebox.showerror("Error", f"Error running analysis:\n{e}")
 
-    ttk.Button(
+        job_runner.submit(
+            "validation", work,
+            on_done=on_done,
+            on_error=on_error,
+            on_progress=lambda message: run_button.config(text=message),
+            on_cancel=lambda: run_button.config(text=run_label)
+        )
+
+    def show_results(result):
+        pos_percent, neg_percent, neu_percent = incremental.percentages_from_counts(result["counts"])
+        test_donut.update(pos_percent, neg_percent, neu_percent)
+
+        if result["confusion"] is None:
+            messagebox.showinfo(
+                "Info",
+                "Analysis complete.\nNo manual labels found for validation."
+            )
+            return
+
+        counts = metrics.counts_from_pairs(result["confusion"])
+        scores = metrics.scores_from_counts(counts)
+        intervals = metrics.bootstrap_intervals(counts)
+
+        low, high = intervals["accuracy"]
+
+        total_var.set(str(int(scores["total"])))
+        correct_var.set(str(int(scores["correct"])))
+        accuracy_var.set(f"{scores['accuracy']*100:.1f}% (95% CI {low*100:.1f}-{high*100:.1f}%)")
+
+        # metrics.LABELS order is Positive, Negative, Neutral
+        precision, recall, f1 = scores["precision"], scores["recall"], scores["f1"]
+
+        precision_pos_var.set(f"{precision[0]*100:.1f}%")
+        precision_neg_var.set(f"{precision[1]*100:.1f}%")
+        precision_neu_var.set(f"{precision[2]*100:.1f}%")
+
+        recall_pos_var.set(f"{recall[0]*100:.1f}%")
+        recall_neg_var.set(f"{recall[1]*100:.1f}%")
+        recall_neu_var.set(f"{recall[2]*100:.1f}%")
+
+        f1_pos_var.set(f"{f1[0]*100:.1f}%")
+        f1_neg_var.set(f"{f1[1]*100:.1f}%")
+        f1_neu_var.set(f"{f1[2]*100:.1f}%")
+
+        cm = metrics.counts_from_pairs(result["confusion"], labels)
+        for i in range(3):
+            for j in range(3):
+                cm_vars[i][j].set(str(cm[i, j]))
+
+        best = result["sweep"]["best"]
+        best_band_var.set(
+            f"{best['negative']:.3f} to {best['positive']:.3f} "
+            f"(macro F1 {best['macro_f1']*100:.1f}%, accuracy {best['accuracy']*100:.1f}%)"
+        )
+
+    run_label = "Run VADER Analysis"
+    run_button = ttk.Button(
         test_win,
-        text="Run VADER Analysis",
+        text=run_label,
         style="Action.TButton",
         command=run_vader_analysis
-    ).grid(row=2, column=0, columnspan=3, pady=15, sticky="ew", padx=10)
+    )
+    run_button.grid(row=2, column=0, columnspan=3, pady=15, sticky="ew", padx=10)
 
     middle_frame = ttk.Frame(test_win, padding=10)
     middle_frame.grid(row=3, column=0, columnspan=3, sticky="nsew")
@@ -218,6 +268,63 @@ def open_test_window(parent):
     ttk.Label(metrics_frame, text="F1 Neu:").grid(row=6, column=2, sticky="w")
     ttk.Label(metrics_frame, textvariable=f1_neu_var).grid(row=7, column=2, sticky="w")
 
+    best_band_var = tk.StringVar(value="—")
+
+    ttk.Label(metrics_frame, text="Best Neutral Band:").grid(row=8, column=0, sticky="w")
+    ttk.Label(metrics_frame, textvariable=best_band_var).grid(row=9, column=0, columnspan=3, sticky="w")
+
     test_win.grid_columnconfigure(0, weight=0)
     test_win.grid_columnconfigure(1, weight=1)
-    test_win.grid_columnconfigure(2, weight=1)
\ No newline at end of file
+    test_win.grid_columnconfigure(2, weight=1)
+
+def threshold_sweep(histogram, negative_grid=NEGATIVE_GRID, positive_grid=POSITIVE_GRID, metric="macro_f1"):
+
+    # histogram is sentiment_analysis.compound_histogram counts, a row per
+    # manual label code. Running totals of each row give how many scores
+    # are <= every negative threshold and >= every positive one, which is
+    # the whole confusion matrix for every threshold pair at once. Pairs
+    # where negative >= positive are NaN
+
+    histogram = np.asarray(histogram)
+    negative_grid = np.asarray(negative_grid, dtype=float)
+    positive_grid = np.asarray(positive_grid, dtype=float)
+
+    size = len(metrics.LABELS) + 1
+    positive, negative, neutral = (metrics.LABELS.index(label) for label in ("Positive", "Negative", "Neutral"))
+    counts = np.zeros((len(negative_grid), len(positive_grid), size, size))
+
+    values = sentiment_analysis.compound_values()
+    below_positive = np.searchsorted(values, positive_grid, side="left")
+    up_to_negative = np.searchsorted(values, negative_grid, side="right")
+
+    for label in range(size):
+        running = np.concatenate([[0], np.cumsum(histogram[label])])
+        total = running[-1]
+        at_or_above = total - running[below_positive]
+        at_or_below = running[up_to_negative]
+
+        counts[:, :, label, positive] = at_or_above[None, :]
+        counts[:, :, label, negative] = at_or_below[:, None]
+        counts[:, :, label, neutral] = total - at_or_above[None, :] - at_or_below[:, None]
+
+    scores = metrics.scores_from_counts(counts)
+    valid = negative_grid[:, None] < positive_grid[None, :]
+
+    grid = {
+        "accuracy": np.where(valid, scores["accuracy"], np.nan),
+        "macro_f1": np.where(valid, scores["f1"].mean(axis=-1), np.nan),
+    }
+
+    i, j = np.unravel_index(np.nanargmax(grid[metric]), grid[metric].shape)
+
+    return {
+        "negative": negative_grid,
+        "positive": positive_grid,
+        **grid,
+        "best": {
+            "negative": float(negative_grid[i]),
+            "positive": float(positive_grid[j]),
+            "accuracy": float(grid["accuracy"][i, j]),
+            "macro_f1": float(grid["macro_f1"][i, j]),
+        },
+    }
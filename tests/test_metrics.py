@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import metrics, sentiment_analysis
+
+"""
+metrics.py against scikit-learn
+
+EXPECTED holds what sklearn's accuracy_score, confusion_matrix and
+precision_recall_fscore_support(labels=metrics.LABELS, average=None,
+zero_division=0) gave for the bundled labelled CSVs (scikit-learn 1.9.1),
+so the metrics are checked whether or not sklearn is installed. When it is
+installed they are also compared directly, on the CSVs and on random labels
+with unknown and missing classes
+
+"""
+
+# precision, recall and f1 are in metrics.LABELS order, Positive, Negative, Neutral
+EXPECTED = {
+    "data/test_sentiment.csv": {
+        "total": 260,
+        "accuracy": 0.7038461538461539,
+        "precision": [0.708737864078, 0.816091954023, 0.557142857143],
+        "recall": [0.811111111111, 0.788888888889, 0.4875],
+        "f1": [0.756476683938, 0.802259887006, 0.52],
+        "confusion": [[73, 2, 15], [3, 71, 16], [27, 14, 39]],
+    },
+    "data/test_sentiment_neg.csv": {
+        "total": 212,
+        "accuracy": 0.7075471698113207,
+        "precision": [0.387096774194, 0.985185185185, 0.108695652174],
+        "recall": [0.923076923077, 0.696335078534, 0.625],
+        "f1": [0.545454545455, 0.815950920245, 0.185185185185],
+        "confusion": [[12, 0, 1], [18, 133, 40], [1, 2, 5]],
+    },
+}
+
+def labelled(path):
+    df = sentiment_analysis.analyze_csv_sentiment(path)
+    return df["manual_sentiment"].tolist(), df["sentiment"].tolist()
+
+def random_labels(seed, size=5000):
+
+    # includes labels outside metrics.LABELS and classes that are never
+    # predicted, which is where zero_division and the "other" row matter
+
+    rng = np.random.default_rng(seed)
+    y_true = rng.choice(metrics.LABELS + ["positive", ""], size=size, p=[0.4, 0.3, 0.2, 0.05, 0.05])
+    y_pred = rng.choice(["Positive", "Negative", "Mixed"], size=size, p=[0.6, 0.35, 0.05])
+    return y_true.tolist(), y_pred.tolist()
+
+@pytest.mark.parametrize("path", list(EXPECTED))
+def test_matches_recorded_sklearn_results(path):
+    expected = EXPECTED[path]
+    y_true, y_pred = labelled(path)
+
+    scores = metrics.classification_scores(y_true, y_pred)
+
+    assert scores["total"] == expected["total"]
+    assert scores["accuracy"] == pytest.approx(expected["accuracy"], abs=1e-12)
+    for name in ("precision", "recall", "f1"):
+        assert scores[name] == pytest.approx(expected[name], abs=1e-11)
+
+    assert metrics.confusion_matrix(y_true, y_pred).tolist() == expected["confusion"]
+
+@pytest.mark.parametrize("case", list(EXPECTED) + ["random-1", "random-2"])
+def test_matches_sklearn(case):
+    sklearn_metrics = pytest.importorskip("sklearn.metrics")
+
+    if case.startswith("random"):
+        y_true, y_pred = random_labels(int(case.split("-")[1]))
+    else:
+        y_true, y_pred = labelled(case)
+
+    scores = metrics.classification_scores(y_true, y_pred)
+    precision, recall, f1, _ = sklearn_metrics.precision_recall_fscore_support(
+        y_true, y_pred, labels=metrics.LABELS, average=None, zero_division=0
+    )
+
+    assert scores["accuracy"] == pytest.approx(sklearn_metrics.accuracy_score(y_true, y_pred), abs=1e-12)
+    np.testing.assert_allclose(scores["precision"], precision, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(scores["recall"], recall, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(scores["f1"], f1, rtol=0, atol=1e-12)
+
+    np.testing.assert_array_equal(
+        metrics.confusion_matrix(y_true, y_pred),
+        sklearn_metrics.confusion_matrix(y_true, y_pred, labels=metrics.LABELS)
+    )
+
+def test_counts_from_pairs_matches_confusion_counts():
+
+    # the streaming validation path builds its counts from (actual, predicted) pairs
+
+    y_true, y_pred = random_labels(3)
+    pairs = pd.Series(list(zip(y_true, y_pred))).value_counts().to_dict()
+
+    np.testing.assert_array_equal(metrics.counts_from_pairs(pairs), metrics.confusion_counts(y_true, y_pred))
+
+def test_bootstrap_matches_resampling_rows():
+
+    # resampling the counts is the same distribution as resampling rows,
+    # so the intervals agree with a row bootstrap up to sampling noise
+
+    y_true, y_pred = labelled("data/test_sentiment.csv")
+    counts = metrics.confusion_counts(y_true, y_pred)
+
+    intervals = metrics.bootstrap_intervals(counts, n_resamples=20000, seed=0)
+
+    rng = np.random.default_rng(1)
+    true_codes, pred_codes = metrics.encode(y_true), metrics.encode(y_pred)
+    rows = rng.integers(0, len(y_true), size=(20000, len(y_true)))
+    accuracy = (true_codes[rows] == pred_codes[rows]).mean(axis=1)
+    low, high = np.percentile(accuracy, [2.5, 97.5])
+
+    assert intervals["accuracy"][0] == pytest.approx(low, abs=0.01)
+    assert intervals["accuracy"][1] == pytest.approx(high, abs=0.01)
+
+    for name in ("accuracy", "precision", "recall", "f1"):
+        point = metrics.scores_from_counts(counts)[name]
+        assert np.all(intervals[name][0] <= point) and np.all(point <= intervals[name][1])
+
+def test_bootstrap_is_repeatable_with_a_seed():
+    counts = metrics.confusion_counts(*random_labels(4))
+
+    first = metrics.bootstrap_intervals(counts, seed=7)
+    second = metrics.bootstrap_intervals(counts, seed=7)
+
+    for name in first:
+        np.testing.assert_array_equal(first[name][0], second[name][0])
+        np.testing.assert_array_equal(first[name][1], second[name][1])
+
+def test_empty_counts():
+    scores = metrics.scores_from_counts(np.zeros((4, 4)))
+
+    assert scores["accuracy"] == 0
+    assert metrics.bootstrap_intervals(np.zeros((4, 4))) == {}
@@ -0,0 +1,88 @@
+import random
+import re
+from pathlib import Path
+import pandas as pd
+import pytest
+from src import preprocessing
+
+"""
+Cleaning against the original clean_text
+
+reference_clean_text is clean_text as it was before its patterns were
+compiled and combined, one re.sub per step. clean_text and clean_series
+must give exactly its output on the bundled datasets and on random texts
+built from the pieces each pattern looks for
+
+"""
+
+DATASETS = [
+    "data/test_sentiment.csv",
+    "data/test_sentiment_neg.csv",
+    "data/news/general_articles.csv",
+    "data/news/mu_articles.csv",
+    "data/reddit/general_posts.csv",
+    "data/reddit/mu_posts.csv",
+]
+
+RANDOM_TEXTS = 20000
+SEED = 4321
+
+FRAGMENTS = [
+    "Man Utd", "GOAL", "the", "and", "not", "is", "of", "united's", "ten hag",
+    "http://x.co/a?b=1", "https://www.bbc.co.uk/sport", "www.mufc.com/x", "http",
+    "@user", "@", "u/redditor", "u/", "r/reddevils", "r/", "/u/x", "you/me",
+    "&amp;", "&amp", "&#39;", "&x;", "&", ";", "&amp@x;", "&@x;", "&u/x;", "&r/y;",
+    "é", "ñ", "ß", "ü", "’", "“", "—", "⚽", "🔥", "_", "__init__",
+    "!", "?", ".", ",", "...", "!?", "#", "$", "%", "(", ")", "'", "\"", "-", "/",
+    " ", "  ", "\t", "\n", "\r\n", "0", "2-1", "90+3'",
+]
+
+def reference_clean_text(text):
+    if not text or pd.isna(text):
+        return ""
+
+    text = text.lower()
+
+    text = re.sub(r"http\S+|www\S+", "", text)
+    text = re.sub(r"@\w+|u/\w+|r/\w+", "", text)
+    text = re.sub(r"&\w+;", "", text)
+    text = re.sub(r"[^a-zA-Z0-9\s!?.,]", "", text)
+
+    text = " ".join(
+        word for word in text.split()
+        if word not in preprocessing.stop_words()
+    )
+
+    return re.sub(r"\s+", " ", text).strip()
+
+def random_texts(count=RANDOM_TEXTS, seed=SEED):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 12)))
+        for _ in range(count)
+    ]
+
+def golden_corpus():
+    texts = []
+    for path in DATASETS:
+        if Path(path).exists():
+            texts.extend(pd.read_csv(path)["text"].dropna().astype(str))
+    return texts + random_texts()
+
+@pytest.fixture(scope="module")
+def corpus():
+    return golden_corpus()
+
+def test_clean_text_matches_reference(corpus):
+    assert [preprocessing.clean_text(text) for text in corpus] == [reference_clean_text(text) for text in corpus]
+
+def test_clean_series_matches_reference(corpus):
+    texts = pd.Series(corpus + [None, "", float("nan")])
+
+    expected = [reference_clean_text(text) for text in texts]
+
+    assert preprocessing.clean_series(texts).tolist() == expected
+
+def test_mention_inside_entity():
+    assert preprocessing.clean_text("&amp@x; goal") == "goal"
+    assert preprocessing.clean_series(pd.Series(["&amp@x; goal"])).tolist() == ["goal"]
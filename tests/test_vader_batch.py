@@ -0,0 +1,100 @@
+import random
+from pathlib import Path
+import pandas as pd
+import pytest
+from src import sentiment_analysis, vader_batch
+
+"""
+BatchScorer against VADER
+
+The vectorized scorer reimplements VADER's rules, these check it gives
+exactly the scores polarity_scores gives (no tolerance) on the bundled
+datasets and on random texts built to hit every rule, so a change in nltk
+that the scorer doesn't follow fails here
+
+Run from the project folder with
+
+    python -m pytest tests
+
+"""
+
+DATASETS = [
+    "data/test_sentiment.csv",
+    "data/test_sentiment_neg.csv",
+    "data/news/general_articles.csv",
+    "data/news/mu_articles.csv",
+    "data/reddit/general_posts.csv",
+    "data/reddit/mu_posts.csv",
+]
+
+RANDOM_TEXTS = 20000
+SEED = 1234
+
+# words that trigger VADER's rules, mixed with random lexicon words
+RULE_WORDS = [
+    "not", "isn't", "never", "no", "without", "nor", "ain't", "cannot",
+    "very", "extremely", "slightly", "hardly", "barely", "totally", "so", "this",
+    "but", "BUT", "kind", "of", "kind of", "sort of", "least", "at least",
+    "yeah right", "the bomb", "cut the mustard", "hand to mouth", "bad ass",
+    "the shit", "too", "like", "sort", "LOL", "GREAT", "WIN", "united", "goal",
+    ":)", ":(", "<3", "!", "!!", "!!!!", "?", "??", "???", ".", ",", "'",
+]
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return sentiment_analysis.build_analyzer()
+
+def expected_scores(analyzer, texts):
+    scores = [analyzer.polarity_scores(text) for text in texts]
+    return {column: [score[column] for score in scores] for column in sentiment_analysis.SCORE_COLUMNS}
+
+def random_texts(analyzer, count=RANDOM_TEXTS, seed=SEED):
+    rng = random.Random(seed)
+    words = sorted(analyzer.lexicon)
+
+    texts = []
+    for _ in range(count):
+        tokens = []
+        for _ in range(rng.randint(0, 25)):
+            word = rng.choice(RULE_WORDS) if rng.random() < 0.4 else rng.choice(words)
+
+            roll = rng.random()
+            if roll < 0.1:
+                word = word.upper()
+            elif roll < 0.15:
+                word = word.capitalize()
+            elif roll < 0.2:
+                word = word + rng.choice(["!", "?", ",", ".", "...", "!?"])
+
+            tokens.append(word)
+        texts.append(" ".join(tokens))
+
+    return texts
+
+@pytest.mark.parametrize("path", [path for path in DATASETS if Path(path).exists()])
+def test_matches_polarity_scores_on_datasets(analyzer, path):
+    texts = pd.read_csv(path)["text"].dropna().astype(str).tolist()
+
+    assert vader_batch.BatchScorer(analyzer).score(texts) == expected_scores(analyzer, texts)
+
+def test_matches_polarity_scores_on_random_texts(analyzer):
+    texts = random_texts(analyzer)
+
+    assert vader_batch.BatchScorer(analyzer).score(texts) == expected_scores(analyzer, texts)
+
+def test_small_batches_match(analyzer):
+
+    # texts are grouped by length into batches, the result must not depend
+    # on how they were split
+
+    texts = random_texts(analyzer, 2000, SEED + 1)
+
+    assert vader_batch.BatchScorer(analyzer, batch_size=7).score(texts) == expected_scores(analyzer, texts)
+
+def test_score_texts_backends_agree(analyzer):
+    texts = random_texts(analyzer, 2000, SEED + 2) + ["", " ", "!!!", "GOAL"]
+
+    vectorized = sentiment_analysis.score_texts(texts, analyzer, backend="vectorized")
+    vader = sentiment_analysis.score_texts(texts, analyzer, backend="vader")
+
+    assert vectorized == vader